@@ -0,0 +1,294 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+# Load environment variables
+load_dotenv()
+
+from batch_runner import PROJECT_TYPES, answer_provider, run_job
+from job_queue import FINISHED_STATUSES, JobQueue, get_job_queue, worker_name
+
+RECENT_LINES = 20
+SERVICE_POLL_SECONDS = 1
+SSE_POLL_SECONDS = 0.5
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def service_workers() -> int:
+    """Jobs run at the same time (SERVICE_WORKERS)."""
+    return int(os.getenv("SERVICE_WORKERS", "2"))
+
+
+def service_queue_size() -> int:
+    """Jobs that may wait for a worker before submissions are refused (SERVICE_QUEUE_SIZE)."""
+    return int(os.getenv("SERVICE_QUEUE_SIZE", "20"))
+
+
+def answer_timeout() -> float:
+    """Seconds an interactive job waits for an answer before using its best judgement (SERVICE_ANSWER_TIMEOUT)."""
+    return float(os.getenv("SERVICE_ANSWER_TIMEOUT", "600"))
+
+
+class JobRequest(BaseModel):
+    query: str
+    project_type: str = "python"  # python, streamlit, fastapi or html
+    answers: list[str] = []  # Replies to the clarifying questions, in order
+    requirements: str = ""  # Given to the questions once answers run out
+    links: list[str] = []  # Reference docs to scrape
+    max_questions: Optional[int] = None
+    interactive: bool = False  # Wait for POST /jobs/{id}/answer instead of answering by itself
+
+
+class AnswerRequest(BaseModel):
+    question_id: str  # From the job's status, so an answer never lands on a later question
+    answer: str
+
+
+def _timestamp(value: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(value).isoformat(timespec="seconds") if value else None
+
+
+def job_info(job: dict, recent_lines: Optional[list[str]] = None, question_id: Optional[str] = None) -> dict:
+    """API view of a queued job."""
+    result = job["result"] or {}
+    status = job["status"]
+    if status == "running" and job["question"]:
+        status = "waiting_for_answer"
+    info = {
+        "id": job["id"],
+        "status": status,
+        "query": job["spec"]["query"],
+        "project_type": job["spec"]["project_type"],
+        "created": _timestamp(job["created"]),
+        "started": _timestamp(job["started"]),
+        "finished": _timestamp(job["finished"]),
+        "attempts": job["attempts"],
+        "completed_stages": list(job["stages"]),
+        "question": job["question"],
+        "question_id": question_id if job["question"] else None,
+        "project_dir": result.get("project_dir") or job["stages"].get("generated", {}).get("project_dir"),
+        "timings": result.get("timings"),
+        "usage": job["usage"],
+        "error": result.get("error"),
+    }
+    if recent_lines is not None:
+        info["recent_lines"] = recent_lines
+    return info
+
+
+class JobService:
+    """Workers that run the jobs in the "service" queue of a JobQueue.
+
+    Jobs survive restarts: one left running by a stopped or crashed process is
+    picked up again once its lease expires and resumes after its last stage.
+    """
+
+    queue_name = "service"
+
+    def __init__(self, job_queue: JobQueue, workers: int, queue_size: int):
+        self.job_queue = job_queue
+        self.queue_size = queue_size
+        self.waiting = {}  # job id -> (question id, question, queue.Queue) while an interactive job waits here
+        self._waiting_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.threads = [threading.Thread(target=self._work, name=f"job-worker-{i + 1}", daemon=True) for i in range(workers)]
+
+    def start(self) -> None:
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """Stop claiming jobs; running jobs finish in their threads or resume in the next process."""
+        self._stop.set()
+
+    def submit(self, request: JobRequest) -> str:
+        """Queue a job; raises queue.Full when SERVICE_QUEUE_SIZE jobs are already waiting."""
+        if self.job_queue.count(self.queue_name, "queued") >= self.queue_size:
+            raise queue.Full
+        job_id = uuid.uuid4().hex[:12]
+        return self.job_queue.enqueue(self.queue_name, {**request.model_dump(), "id": job_id}, job_id)
+
+    def question_id(self, job_id: str) -> Optional[str]:
+        with self._waiting_lock:
+            waiting = self.waiting.get(job_id)
+        return waiting[0] if waiting else None
+
+    def give_answer(self, job_id: str, question_id: str, answer: str) -> Optional[str]:
+        """Answer the question the job is waiting on; returns it, or None if question_id is not pending."""
+        with self._waiting_lock:
+            waiting = self.waiting.get(job_id)
+            if waiting is None or waiting[0] != question_id:
+                return None
+            # One answer per question: a second POST for the same id is refused
+            del self.waiting[job_id]
+        waiting[2].put(answer)
+        return waiting[1]
+
+    def _work(self) -> None:
+        worker = worker_name()
+        while not self._stop.is_set():
+            job = self.job_queue.claim(self.queue_name, worker)
+            if job is None:
+                self._stop.wait(SERVICE_POLL_SECONDS)
+                continue
+            run_job(self.job_queue, job, worker, self._logger(job["id"]), self._answer_provider(job))
+
+    def _logger(self, job_id: str):
+        def log(*args) -> None:
+            text = " ".join(str(arg) for arg in args).strip("\n")
+            self.job_queue.append_log(job_id, text.splitlines() or [""])
+            print(f"[job {job_id}] {text}")
+        return log
+
+    def _ask(self, job_id: str, question: str) -> Optional[str]:
+        """Publish a question under a fresh id and wait for its answer; None when none arrives in time."""
+        question_id = uuid.uuid4().hex[:8]
+        reply = queue.Queue()
+        with self._waiting_lock:
+            self.waiting[job_id] = (question_id, question, reply)
+        self.job_queue.set_question(job_id, question)
+        try:
+            return reply.get(timeout=answer_timeout())
+        except queue.Empty:
+            with self._waiting_lock:
+                self.waiting.pop(job_id, None)
+            # An answer accepted just before the question was withdrawn still counts
+            try:
+                return reply.get_nowait()
+            except queue.Empty:
+                self._logger(job_id)("No answer received in time, continuing with best judgement")
+                return None
+        finally:
+            with self._waiting_lock:
+                self.waiting.pop(job_id, None)
+            self.job_queue.set_question(job_id, None)
+
+    def _answer_provider(self, job: dict):
+        """Answer questions from the request, then (for interactive jobs) from POST /jobs/{id}/answer."""
+        spec = job["spec"]
+        answers = list(spec["answers"])
+        fallback = answer_provider({"requirements": spec["requirements"]})
+
+        def answer(question: str) -> str:
+            if answers:
+                return answers.pop(0)
+            if spec["interactive"]:
+                reply = self._ask(job["id"], question)
+                if reply is not None:
+                    return reply
+            return fallback(question)
+        return answer
+
+
+service = JobService(get_job_queue(), service_workers(), service_queue_size())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Workers, LLM clients and venv/browser pools live as long as the process;
+    # jobs themselves live in the job queue and outlast it
+    service.start()
+    yield
+    service.stop()
+
+
+app = FastAPI(title="Vibe Coder Agent", lifespan=lifespan)
+
+
+def _get_job(job_id: str) -> dict:
+    job = service.job_queue.get(job_id)
+    if job is None or job["queue"] != service.queue_name:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/jobs", status_code=202)
+def submit_job(request: JobRequest):
+    request.project_type = request.project_type.lower()
+    if request.project_type not in PROJECT_TYPES:
+        raise HTTPException(status_code=422, detail=f"project_type must be one of {sorted(PROJECT_TYPES)}")
+    try:
+        job_id = service.submit(request)
+    except queue.Full:
+        raise HTTPException(status_code=503, detail="Too many queued jobs, try again later")
+    return {"id": job_id, "status": "queued", "queued": service.job_queue.count(service.queue_name, "queued")}
+
+
+@app.get("/jobs")
+def list_jobs():
+    return [job_info(job, question_id=service.question_id(job["id"])) for job in service.job_queue.list_jobs(service.queue_name)]
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = _get_job(job_id)
+    start = max(service.job_queue.log_length(job_id) - RECENT_LINES, 0)
+    return job_info(job, service.job_queue.read_log(job_id, start), service.question_id(job_id))
+
+
+@app.post("/jobs/{job_id}/answer")
+def answer_question(job_id: str, request: AnswerRequest):
+    _get_job(job_id)
+    question = service.give_answer(job_id, request.question_id, request.answer)
+    if question is None:
+        raise HTTPException(status_code=409, detail="Job is not waiting for an answer to this question")
+    return {"id": job_id, "question_id": request.question_id, "answered": question}
+
+
+def _sse(data: str, event: Optional[str] = None, event_id: Optional[int] = None) -> str:
+    fields = []
+    if event_id is not None:
+        fields.append(f"id: {event_id}")
+    if event:
+        fields.append(f"event: {event}")
+    fields.extend(f"data: {line}" for line in (data.splitlines() or [""]))
+    return "\n".join(fields) + "\n\n"
+
+
+async def _progress_events(job_id: str, start: int):
+    index, last_sent = start, time.monotonic()
+    while True:
+        # Read the status first so lines logged just before the job finished are not missed
+        status = (await asyncio.to_thread(service.job_queue.get, job_id))["status"]
+        lines = await asyncio.to_thread(service.job_queue.read_log, job_id, index)
+        for line in lines:
+            yield _sse(line, event_id=index)
+            index += 1
+        if lines:
+            last_sent = time.monotonic()
+        elif status in FINISHED_STATUSES:
+            yield _sse(status, event="done")
+            return
+        elif time.monotonic() - last_sent > SSE_KEEPALIVE_SECONDS:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(SSE_POLL_SECONDS)
+
+
+@app.get("/jobs/{job_id}/events")
+def job_events(job_id: str, start: int = 0, last_event_id: Optional[str] = Header(None)):
+    """Server-sent events: one `data` event per progress line, then a `done` event with the final status.
+
+    Reconnecting clients resume after Last-Event-ID (or from the `start` line).
+    """
+    _get_job(job_id)
+    if last_event_id and last_event_id.isdigit():
+        start = int(last_event_id) + 1
+    return StreamingResponse(_progress_events(job_id, start), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=os.getenv("SERVICE_HOST", "127.0.0.1"), port=int(os.getenv("SERVICE_PORT", "8080")))
@@ -0,0 +1,86 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from models import File
+from response_cache import get_cache_dir
+
+_lock = threading.Lock()
+
+
+@contextmanager
+def _connect():
+    """Open the analysis cache, commit on success and always close it."""
+    conn = sqlite3.connect(os.path.join(get_cache_dir(), "analysis.sqlite3"), timeout=30)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS file_summaries ("
+        "content_hash TEXT PRIMARY KEY, "
+        "name TEXT NOT NULL, "
+        "summary TEXT NOT NULL, "
+        "created_at REAL NOT NULL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS analyses ("
+        "fingerprint TEXT PRIMARY KEY, "
+        "payload TEXT NOT NULL, "
+        "created_at REAL NOT NULL)"
+    )
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def file_hash(file: File) -> str:
+    """Hash of a file's path and contents; a summary stays valid while this is unchanged."""
+    return hashlib.sha256(f"{file.name}\0{file.content}".encode("utf-8")).hexdigest()
+
+
+def project_fingerprint(files: list[File]) -> str:
+    """Hash of every file in the project, used to reuse a whole analysis."""
+    return hashlib.sha256("\n".join(sorted(file_hash(file) for file in files)).encode("utf-8")).hexdigest()
+
+
+def get_file_summaries(files: list[File]) -> dict:
+    """Cached summaries for the given files, keyed by file name (files without one are absent)."""
+    hashes = {file_hash(file): file.name for file in files}
+    summaries = {}
+    with _lock, _connect() as conn:
+        for content_hash, name in hashes.items():
+            row = conn.execute("SELECT summary FROM file_summaries WHERE content_hash = ?", (content_hash,)).fetchone()
+            if row:
+                summaries[name] = row[0]
+    return summaries
+
+
+def store_file_summaries(files: list[File], summaries: dict) -> None:
+    """Remember summaries (keyed by file name) against the files' content hashes."""
+    now = time.time()
+    with _lock, _connect() as conn:
+        for file in files:
+            if file.name in summaries:
+                conn.execute(
+                    "INSERT OR REPLACE INTO file_summaries (content_hash, name, summary, created_at) VALUES (?, ?, ?, ?)",
+                    (file_hash(file), file.name, summaries[file.name], now),
+                )
+
+
+def get_cached_analysis(fingerprint: str) -> Optional[str]:
+    """The stored ProjectAnalysisEvent JSON for an unchanged project, if any."""
+    with _lock, _connect() as conn:
+        row = conn.execute("SELECT payload FROM analyses WHERE fingerprint = ?", (fingerprint,)).fetchone()
+    return row[0] if row else None
+
+
+def store_analysis(fingerprint: str, payload: str) -> None:
+    """Remember the ProjectAnalysisEvent JSON produced for a project fingerprint."""
+    with _lock, _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO analyses (fingerprint, payload, created_at) VALUES (?, ?, ?)",
+            (fingerprint, payload, time.time()),
+        )
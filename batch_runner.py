@@ -0,0 +1,228 @@
+import argparse
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from job_queue import JobQueue, get_job_queue, hold_lease, worker_name
+from latest_coding_agent import run_pipeline
+from usage_tracker import track_usage
+
+PROJECT_TYPES = {"python", "streamlit", "fastapi", "html"}
+DEFAULT_ANSWER = "Use your best judgement for this and any other open details."
+BATCH_POLL_SECONDS = 5
+
+_write_lock = threading.Lock()
+
+
+def batch_workers() -> int:
+    """Specs generated at the same time (BATCH_WORKERS)."""
+    return int(os.getenv("BATCH_WORKERS", "2"))
+
+
+def batch_max_questions() -> int:
+    """Clarifying questions answered per spec before the model must proceed (BATCH_MAX_QUESTIONS)."""
+    return int(os.getenv("BATCH_MAX_QUESTIONS", "5"))
+
+
+def load_specs(path: str) -> list[dict]:
+    """Read generation specs from a JSONL file, one JSON object per line.
+
+    Each spec needs a query; id (default: line number), project_type
+    (python, streamlit, fastapi or html; default python), answers (list of
+    replies to the clarifying questions, in order), requirements (text given
+    to every question once answers run out) and links are optional.
+    """
+    specs, seen = [], set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            spec = json.loads(line)
+            if not spec.get("query"):
+                raise ValueError(f"{path}:{line_number}: spec has no query")
+            spec["id"] = str(spec.get("id", line_number))
+            if spec["id"] in seen:
+                raise ValueError(f"{path}:{line_number}: duplicate spec id {spec['id']!r}")
+            seen.add(spec["id"])
+            spec["project_type"] = spec.get("project_type", "python").lower()
+            if spec["project_type"] not in PROJECT_TYPES:
+                raise ValueError(f"{path}:{line_number}: unknown project_type {spec['project_type']!r}")
+            specs.append(spec)
+    return specs
+
+
+def answer_provider(spec: dict):
+    """Answer clarifying questions from the spec's answers, then from its requirements."""
+    answers = list(spec.get("answers") or [])
+    requirements = spec.get("requirements", "")
+
+    def answer(question: str) -> str:
+        if answers:
+            return answers.pop(0)
+        if requirements:
+            return f"{requirements}\n\n{DEFAULT_ANSWER}"
+        return DEFAULT_ANSWER
+    return answer
+
+
+def spec_query(spec: dict) -> str:
+    """The spec's query, with the framework spelled out for streamlit and fastapi specs."""
+    query = spec["query"]
+    if spec["project_type"] == "streamlit":
+        query += "\n\nBuild it as a Streamlit app."
+    elif spec["project_type"] == "fastapi":
+        query += "\n\nBuild it as a FastAPI service."
+    return query
+
+
+def run_job(job_queue: JobQueue, job: dict, worker: str, log, answer=None, max_questions: int | None = None, use_cache: bool = True) -> dict | None:
+    """Run a claimed job to completion, checkpointing each pipeline stage, and return its result record.
+
+    A job claimed again after its worker died resumes after its last saved stage.
+    Returns None when the worker lost its lease and another worker took the job over.
+    use_cache=False makes every model call in the job go to the API.
+    """
+    spec = job["spec"]
+    record = {
+        "id": spec["id"],
+        "query": spec["query"],
+        "project_type": spec["project_type"],
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "attempt": job["attempts"],
+    }
+    started = time.monotonic()
+
+    def on_stage(stage: str, data: dict) -> None:
+        if not job_queue.save_stage(job["id"], worker, stage, data):
+            raise RuntimeError(f"Lost the lease on job {job['id']} to another worker")
+
+    with track_usage() as usage, hold_lease(job_queue, job["id"], worker, usage):
+        try:
+            if job["stages"]:
+                log(f"Resuming after stages: {', '.join(job['stages'])}")
+            links = spec.get("links") or []
+            browser_pool = None
+            if links:
+                # Jobs in one process share its warm browsers; selenium is only imported when needed
+                from scraper_doc import get_browser_pool
+                browser_pool = get_browser_pool()
+            result = run_pipeline(
+                spec_query(spec),
+                "html" if spec["project_type"] == "html" else "python",
+                links,
+                answer_provider=answer or answer_provider(spec),
+                log=log,
+                max_questions=spec.get("max_questions") or max_questions or batch_max_questions(),
+                keep_running=False,
+                stages=job["stages"],
+                on_stage=on_stage,
+                browser_pool=browser_pool,
+                use_cache=use_cache,
+            )
+            record.update(
+                status=result["status"],
+                project_dir=result["project_dir"],
+                timings=result["timings"],
+                error=None,
+            )
+        except Exception as e:
+            log(f"❌ {e}")
+            record.update(
+                status="error",
+                project_dir=None,
+                timings={"total_seconds": round(time.monotonic() - started, 2)},
+                error="".join(traceback.format_exception_only(type(e), e)).strip(),
+            )
+    record["usage"] = dict(usage)
+    if not job_queue.finish(job["id"], worker, record["status"], record):
+        log("⚠️ Another worker took over this job, discarding this result")
+        return None
+    return record
+
+
+def spec_logger(spec_id: str):
+    """A log function that prefixes every line with the spec id."""
+    prefix = f"[{spec_id}]"
+
+    def log(*args) -> None:
+        # Prefix every line so interleaved output from parallel specs stays readable
+        text = " ".join(str(arg) for arg in args).strip("\n")
+        print("\n".join(f"{prefix} {line}" for line in text.splitlines()))
+    return log
+
+
+def write_result(output_path: str, record: dict) -> None:
+    """Append one result record to the results JSONL file."""
+    with _write_lock, open(output_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def run_batch(specs: list[dict], output_path: str, workers: int | None = None, max_questions: int | None = None, run_id: str | None = None, job_queue: JobQueue | None = None, use_cache: bool = True) -> list[dict]:
+    """Generate every spec with a pool of workers, appending each result to output_path as it finishes.
+
+    Specs are queued under run_id; running the same run_id again (e.g. after a
+    crash) skips finished specs and resumes interrupted ones after their last
+    completed stage once their lease expires. use_cache=False bypasses the
+    response cache so results reflect fresh model output.
+    """
+    workers = workers or batch_workers()
+    job_queue = job_queue or get_job_queue()
+    run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+    queue_name = f"batch:{run_id}"
+    for spec in specs:
+        job_queue.enqueue(queue_name, spec, job_id=f"{run_id}:{spec['id']}")
+    records = []
+
+    def work() -> None:
+        worker = worker_name()
+        while True:
+            job = job_queue.claim(queue_name, worker)
+            if job is None:
+                # Jobs held by a dead worker become claimable when their lease runs out
+                if job_queue.count(queue_name, "queued") == 0 and job_queue.count(queue_name, "running") == 0:
+                    return
+                time.sleep(BATCH_POLL_SECONDS)
+                continue
+            record = run_job(job_queue, job, worker, spec_logger(job["spec"]["id"]), max_questions=max_questions, use_cache=use_cache)
+            if record is None:
+                continue
+            write_result(output_path, record)
+            records.append(record)
+            print(f"[{record['id']}] {record['status']} in {record['timings'].get('total_seconds')}s")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(work) for _ in range(workers)]:
+            future.result()
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate projects from a JSONL file of specs without prompts.")
+    parser.add_argument("specs", help="JSONL file with one spec per line")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("--workers", type=int, default=None, help="specs generated at the same time (default: BATCH_WORKERS or 2)")
+    parser.add_argument("--resume", metavar="RUN_ID", default=None, help="continue an interrupted run instead of starting a new one")
+    parser.add_argument("--max-questions", type=int, default=None, help="clarifying questions answered per spec (default: BATCH_MAX_QUESTIONS or 5)")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the response cache so every spec gets fresh model output")
+    args = parser.parse_args()
+
+    specs = load_specs(args.specs)
+    run_id = args.resume or datetime.now().strftime("%Y%m%d_%H%M%S")
+    print(f"Running {len(specs)} specs as run {run_id} (continue it with --resume {run_id}), results in {args.output}")
+    records = run_batch(specs, args.output, args.workers, args.max_questions, run_id, use_cache=not args.no_cache)
+    succeeded = sum(1 for record in records if record["status"] == "succeeded")
+    print(f"{succeeded}/{len(records)} specs succeeded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import os
+
+from models import File, CodeRepairEvent
+from project_snapshot import write_file
+
+
+def build_repair_message(message: list, project_files: list[File], error: str) -> list:
+    """Extend the conversation with the current files and ask for minimal search/replace edits."""
+    repair_message = list(message)
+    for file in project_files:
+        repair_message.append({
+            "role": "user",
+            "content": f"Current file: {file.name}\n\n```\n{file.content}\n```"
+        })
+    repair_message.append({
+        "role": "user",
+        "content": (
+            f"Running the project failed with this error:\n{error}\n\n"
+            "Fix it with the smallest possible edits. For each change return the file name, "
+            "a `search` block copied exactly from the current file (a few lines, enough to be unique) "
+            "and the `replace` text. Use an empty `search` only to create a new file or replace a file "
+            "completely. Do not return files that do not need to change."
+        )
+    })
+    return repair_message
+
+
+def _locate(content: str, search: str) -> tuple[int, int] | None:
+    """Find search in content exactly, or ignoring trailing whitespace on each line."""
+    index = content.find(search)
+    if index != -1:
+        return index, index + len(search)
+    lines = content.splitlines(keepends=True)
+    wanted = [line.rstrip() for line in search.strip("\n").splitlines()]
+    if not wanted:
+        return None
+    for start in range(len(lines) - len(wanted) + 1):
+        if all(lines[start + i].rstrip() == wanted[i] for i in range(len(wanted))):
+            begin = sum(len(line) for line in lines[:start])
+            end = begin + sum(len(line) for line in lines[start:start + len(wanted)])
+            return begin, end
+    return None
+
+
+def apply_repair(project_dir: str, event: CodeRepairEvent) -> list[str]:
+    """Apply search/replace edits in place and return the names of the changed files.
+
+    Every edit is checked before anything is written, so a ValueError leaves
+    the project untouched. An empty edit list is a ValueError too, since
+    re-running the unchanged project would only repeat the failure.
+    """
+    if not event.edits:
+        raise ValueError("no edits returned")
+    pending = {}
+    for edit in event.edits:
+        path = os.path.join(project_dir, edit.name)
+        if edit.name not in pending:
+            if os.path.exists(path):
+                with open(path, "r") as f:
+                    pending[edit.name] = f.read()
+            else:
+                pending[edit.name] = None
+        content = pending[edit.name]
+        if not edit.search:
+            pending[edit.name] = edit.replace
+            continue
+        if content is None:
+            raise ValueError(f"{edit.name} does not exist")
+        span = _locate(content, edit.search)
+        if span is None:
+            raise ValueError(f"search block not found in {edit.name}")
+        replace = edit.replace
+        # Keep the line break after a replaced block, but not after a deleted one
+        if replace and content[span[1] - 1:span[1]] == "\n" and not replace.endswith("\n"):
+            replace += "\n"
+        pending[edit.name] = content[:span[0]] + replace + content[span[1]:]
+
+    for name, content in pending.items():
+        write_file(os.path.join(project_dir, name), content)
+    return list(pending)
@@ -0,0 +1,85 @@
+import json
+
+from models import File
+
+
+class CodeGenerationStreamParser:
+    """Incrementally parse a streamed CodeGenerationEvent JSON document.
+
+    Feed raw text deltas as they arrive; every ``File`` object inside
+    ``generated_code`` is returned as soon as its closing brace is seen, and the
+    ``run_command`` string as soon as its closing quote is seen.
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.position = 0
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.expect_key = False
+        self.string_start = None
+        self.string_is_key = False
+        self.current_key = None
+        self.file_start = None
+        self.files = []
+        self.run_command = None
+
+    def feed(self, delta: str) -> list:
+        """Consume a chunk of text and return newly completed File / run_command items."""
+        completed = []
+        for char in delta:
+            self.buffer.append(char)
+            index = self.position
+            self.position += 1
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    self._on_string_end(index, completed)
+                continue
+
+            if char == '"':
+                self.in_string = True
+                self.string_start = index
+                self.string_is_key = self.expect_key
+            elif char in "{[":
+                self.stack.append(char)
+                self.expect_key = char == "{"
+                if self.stack == ["{", "[", "{"] and self.current_key == "generated_code":
+                    self.file_start = index
+            elif char in "}]":
+                if self.stack:
+                    self.stack.pop()
+                self.expect_key = False
+                if self.file_start is not None and self.stack == ["{", "["]:
+                    self._emit_file(index, completed)
+            elif char == ",":
+                self.expect_key = bool(self.stack) and self.stack[-1] == "{"
+            elif char == ":":
+                self.expect_key = False
+        return completed
+
+    def _on_string_end(self, index: int, completed: list) -> None:
+        if len(self.stack) != 1:
+            return
+        value = json.loads("".join(self.buffer[self.string_start:index + 1]))
+        if self.string_is_key:
+            self.current_key = value
+        elif self.current_key == "run_command" and self.run_command is None:
+            self.run_command = value
+            completed.append(value)
+
+    def _emit_file(self, index: int, completed: list) -> None:
+        raw = "".join(self.buffer[self.file_start:index + 1])
+        self.file_start = None
+        try:
+            file = File.model_validate_json(raw)
+        except ValueError:
+            return
+        self.files.append(file)
+        completed.append(file)
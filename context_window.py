@@ -0,0 +1,73 @@
+import os
+
+from token_counter import count_message_tokens
+
+KEEP_RECENT_MESSAGES = 6
+SUMMARY_PREFIX = "Requirements gathered so far:"
+
+
+def context_token_budget() -> int:
+    """Maximum prompt size of the conversation sent to the model (CONTEXT_TOKEN_BUDGET)."""
+    return int(os.getenv("CONTEXT_TOKEN_BUDGET", "16000"))
+
+
+def _is_summary(message: dict) -> bool:
+    return message.get("role") == "user" and str(message.get("content", "")).startswith(SUMMARY_PREFIX)
+
+
+def compact_messages(messages: list, summary: str | None = None, token_budget: int | None = None,
+                     keep_recent: int = KEEP_RECENT_MESSAGES) -> list:
+    """Return the conversation shrunk to fit token_budget, or unchanged if it already fits.
+
+    The system prompt, the user's original request and the last keep_recent
+    messages are kept verbatim. Older question/answer turns (an assistant
+    message followed by the user's reply) are collapsed into one message holding
+    the accumulated requirements summary; without a summary they are kept. If
+    that is still too large, the remaining older messages are dropped oldest
+    first, then the recent ones.
+    Message dicts are reused, not copied.
+    """
+    token_budget = token_budget or context_token_budget()
+    if count_message_tokens(messages) <= token_budget:
+        return list(messages)
+
+    # Leading system prompt(s) plus the first user request
+    head_end = 0
+    while head_end < len(messages) and messages[head_end].get("role") == "system":
+        head_end += 1
+    head_end = min(head_end + 1, len(messages))
+    tail_start = max(head_end, len(messages) - keep_recent)
+    # Don't split a question from its answer at the boundary
+    if (tail_start > head_end and messages[tail_start].get("role") == "user"
+            and messages[tail_start - 1].get("role") == "assistant"):
+        tail_start -= 1
+    head, middle, tail = messages[:head_end], messages[head_end:tail_start], messages[tail_start:]
+
+    kept, collapsed = [], 0
+    i = 0
+    # Without a summary to replace them, older turns are only dropped by the budget loop below
+    while summary and i < len(middle):
+        current = middle[i]
+        if _is_summary(current):
+            i += 1
+            continue
+        if (current.get("role") == "assistant" and i + 1 < len(middle)
+                and middle[i + 1].get("role") == "user"):
+            collapsed += 1
+            i += 2
+            continue
+        kept.append(current)
+        i += 1
+    if not summary:
+        kept = list(middle)
+    elif collapsed or any(_is_summary(message) for message in middle):
+        kept.append({"role": "user", "content": f"{SUMMARY_PREFIX}\n{summary}"})
+
+    # Still too large: drop older context, then the oldest recent turns (never the last message)
+    while kept and count_message_tokens(head + kept + tail) > token_budget:
+        # A question goes together with its answer
+        pair = len(kept) > 1 and kept[0].get("role") == "assistant" and kept[1].get("role") == "user"
+        del kept[:2 if pair else 1]
+    while len(tail) > 1 and count_message_tokens(head + kept + tail) > token_budget:
+        tail.pop(0)
+    return head + kept + tail
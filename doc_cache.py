@@ -0,0 +1,227 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from response_cache import get_cache_dir
+
+_lock = threading.Lock()
+
+
+def docs_cache_enabled() -> bool:
+    """Return False when the scraped-docs cache is bypassed via DISABLE_DOCS_CACHE."""
+    return os.getenv("DISABLE_DOCS_CACHE", "").lower() not in ("1", "true", "yes")
+
+
+def _ttl() -> float:
+    """Seconds a cached page or image is served without asking the server (DOCS_CACHE_TTL_HOURS)."""
+    return float(os.getenv("DOCS_CACHE_TTL_HOURS", "24")) * 3600
+
+
+def _blob_dir() -> str:
+    blob_dir = os.path.join(get_cache_dir(), "doc_blobs")
+    os.makedirs(blob_dir, exist_ok=True)
+    return blob_dir
+
+
+@contextmanager
+def _connect():
+    """Open the docs cache database, commit on success and always close it."""
+    conn = sqlite3.connect(os.path.join(get_cache_dir(), "docs.sqlite3"), timeout=30)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS pages ("
+        "url TEXT NOT NULL, "
+        "variant TEXT NOT NULL, "
+        "markdown TEXT NOT NULL, "
+        "images TEXT NOT NULL, "
+        "etag TEXT, "
+        "last_modified TEXT, "
+        "size INTEGER NOT NULL, "
+        "validated_at REAL NOT NULL, "
+        "last_used REAL NOT NULL, "
+        "PRIMARY KEY (url, variant))"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS images ("
+        "url TEXT PRIMARY KEY, "
+        "blob TEXT NOT NULL, "
+        "etag TEXT, "
+        "last_modified TEXT, "
+        "size INTEGER NOT NULL, "
+        "validated_at REAL NOT NULL, "
+        "last_used REAL NOT NULL)"
+    )
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def conditional_headers(cached: Optional[dict]) -> dict:
+    """If-None-Match / If-Modified-Since headers for revalidating a cached entry."""
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    return headers
+
+
+def _store_blob(data: bytes) -> str:
+    """Write bytes to the content-addressed blob store and return their hash."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = os.path.join(_blob_dir(), digest)
+    if not os.path.exists(path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return digest
+
+
+def get_cached_page(url: str, variant: str) -> Optional[dict]:
+    """Return the cached markdown for a URL with its validators, or None on a miss.
+
+    The "fresh" flag tells whether the entry is within its TTL; stale entries
+    should be revalidated with conditional_headers() before being reused.
+    """
+    now = time.time()
+    with _lock, _connect() as conn:
+        row = conn.execute(
+            "SELECT markdown, images, etag, last_modified, validated_at FROM pages WHERE url = ? AND variant = ?",
+            (url, variant),
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE pages SET last_used = ? WHERE url = ? AND variant = ?", (now, url, variant))
+    markdown, images, etag, last_modified, validated_at = row
+    return {
+        "markdown": markdown,
+        "images": json.loads(images),
+        "etag": etag,
+        "last_modified": last_modified,
+        "fresh": now - validated_at < _ttl(),
+    }
+
+
+def store_page(url: str, variant: str, markdown: str, headers=None, images: Optional[dict] = None) -> None:
+    """Cache a scraped page with the response's ETag/Last-Modified and any local images.
+
+    images maps the file names referenced from the markdown to their bytes.
+    """
+    headers = headers or {}
+    size = len(markdown.encode("utf-8")) + sum(len(data) for data in (images or {}).values())
+    now = time.time()
+    # Blobs are written under the lock so a concurrent eviction cannot collect them before the row exists
+    with _lock, _connect() as conn:
+        blobs = {name: _store_blob(data) for name, data in (images or {}).items()}
+        conn.execute(
+            "INSERT OR REPLACE INTO pages (url, variant, markdown, images, etag, last_modified, size, validated_at, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, variant, markdown, json.dumps(blobs), headers.get("ETag"), headers.get("Last-Modified"), size, now, now),
+        )
+        _evict(conn)
+
+
+def touch_page(url: str, variant: str) -> None:
+    """Mark a cached page as revalidated (the server answered 304 Not Modified)."""
+    now = time.time()
+    with _lock, _connect() as conn:
+        conn.execute("UPDATE pages SET validated_at = ?, last_used = ? WHERE url = ? AND variant = ?", (now, now, url, variant))
+
+
+def restore_images(images: dict, img_dir: str) -> None:
+    """Copy a cached page's images into img_dir under the names its markdown uses."""
+    os.makedirs(img_dir, exist_ok=True)
+    for name, digest in images.items():
+        source = os.path.join(_blob_dir(), digest)
+        if os.path.exists(source):
+            shutil.copyfile(source, os.path.join(img_dir, name))
+
+
+def get_cached_image(url: str) -> Optional[dict]:
+    """Return a cached image's blob path and digest with its validators and "fresh" flag, or None on a miss."""
+    now = time.time()
+    with _lock, _connect() as conn:
+        row = conn.execute(
+            "SELECT blob, etag, last_modified, validated_at FROM images WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE images SET last_used = ? WHERE url = ?", (now, url))
+    digest, etag, last_modified, validated_at = row
+    path = os.path.join(_blob_dir(), digest)
+    if not os.path.exists(path):
+        return None
+    return {"path": path, "digest": digest, "etag": etag, "last_modified": last_modified, "fresh": now - validated_at < _ttl()}
+
+
+def store_image(url: str, path: str, digest: str, headers=None) -> None:
+    """Cache a downloaded image file (whose SHA-256 is digest) with the response's validators."""
+    headers = headers or {}
+    now = time.time()
+    with _lock, _connect() as conn:
+        blob_path = os.path.join(_blob_dir(), digest)
+        if not os.path.exists(blob_path):
+            shutil.copyfile(path, f"{blob_path}.tmp")
+            os.replace(f"{blob_path}.tmp", blob_path)
+        conn.execute(
+            "INSERT OR REPLACE INTO images (url, blob, etag, last_modified, size, validated_at, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (url, digest, headers.get("ETag"), headers.get("Last-Modified"), os.path.getsize(blob_path), now, now),
+        )
+        _evict(conn)
+
+
+def touch_image(url: str) -> None:
+    """Mark a cached image as revalidated."""
+    now = time.time()
+    with _lock, _connect() as conn:
+        conn.execute("UPDATE images SET validated_at = ?, last_used = ? WHERE url = ?", (now, now, url))
+
+
+def _evict(conn: sqlite3.Connection) -> None:
+    """Drop the least recently used pages and images until under DOCS_CACHE_MAX_MB, then unreferenced blobs."""
+    max_bytes = int(float(os.getenv("DOCS_CACHE_MAX_MB", "100")) * 1024 * 1024)
+    total = conn.execute(
+        "SELECT (SELECT COALESCE(SUM(size), 0) FROM pages) + (SELECT COALESCE(SUM(size), 0) FROM images)"
+    ).fetchone()[0]
+    if total <= max_bytes:
+        return
+    entries = conn.execute(
+        "SELECT 'pages', url, variant, size, last_used FROM pages "
+        "UNION ALL SELECT 'images', url, NULL, size, last_used FROM images "
+        "ORDER BY last_used ASC"
+    ).fetchall()
+    for table, url, variant, size, _ in entries:
+        if table == "pages":
+            conn.execute("DELETE FROM pages WHERE url = ? AND variant = ?", (url, variant))
+        else:
+            conn.execute("DELETE FROM images WHERE url = ?", (url,))
+        total -= size
+        if total <= max_bytes:
+            break
+
+    referenced = {row[0] for row in conn.execute("SELECT blob FROM images")}
+    for (images,) in conn.execute("SELECT images FROM pages"):
+        referenced.update(json.loads(images).values())
+    for name in os.listdir(_blob_dir()):
+        if name not in referenced:
+            try:
+                os.remove(os.path.join(_blob_dir(), name))
+            except OSError:
+                pass
+
+
+def clear_docs_cache() -> None:
+    """Remove every cached page and image."""
+    with _lock, _connect() as conn:
+        conn.execute("DELETE FROM pages")
+        conn.execute("DELETE FROM images")
+    shutil.rmtree(_blob_dir(), ignore_errors=True)
@@ -0,0 +1,129 @@
+import math
+import os
+import re
+from collections import Counter
+
+from token_counter import count_tokens
+
+CHUNK_TOKENS = 300
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from", "how", "i", "if", "in", "is",
+    "it", "me", "my", "of", "on", "or", "so", "that", "the", "this", "to", "use", "want", "we", "with", "you",
+}
+HEADING_PATTERN = re.compile(r"^#{1,6}\s")
+
+
+def docs_token_budget() -> int:
+    """Total tokens of reference documentation allowed into the prompt (DOCS_TOKEN_BUDGET)."""
+    return int(os.getenv("DOCS_TOKEN_BUDGET", "4000"))
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word terms used for lexical matching."""
+    return [term for term in re.findall(r"[a-z0-9_]+", text.lower()) if term not in STOPWORDS and len(term) > 1]
+
+
+def chunk_markdown(markdown: str, chunk_tokens: int = CHUNK_TOKENS) -> list[str]:
+    """Split markdown into section-aware chunks of roughly chunk_tokens tokens.
+
+    Chunks never span two headings; each one that does not start with its
+    section's heading gets it prepended so it still reads on its own.
+    """
+    chunks = []
+    heading, parts, size = "", [], 0
+
+    def flush():
+        nonlocal parts, size
+        if parts:
+            text = "\n\n".join(parts)
+            if heading and not text.startswith(heading):
+                text = f"{heading}\n\n{text}"
+            chunks.append(text)
+        parts, size = [], 0
+
+    for block in re.split(r"\n\s*\n", markdown):
+        block = block.strip()
+        if not block:
+            continue
+        if HEADING_PATTERN.match(block):
+            flush()
+            heading = block.splitlines()[0]
+        block_size = count_tokens(block)
+        # A heading stays with the block that follows it
+        if parts and parts != [heading] and size + block_size > chunk_tokens:
+            flush()
+        parts.append(block)
+        size += block_size
+    flush()
+    return chunks
+
+
+class BM25:
+    """Okapi BM25 scoring over a fixed list of documents."""
+
+    def __init__(self, documents: list[str], k1: float = 1.5, b: float = 0.75, tokenizer=tokenize):
+        self.k1, self.b = k1, b
+        self.tokenizer = tokenizer
+        self.term_counts = [Counter(tokenizer(document)) for document in documents]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        total = len(documents)
+        self.idf = {
+            term: math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+
+    def scores(self, query: str) -> list[float]:
+        terms = set(self.tokenizer(query))
+        results = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / (self.average_length or 1))
+            for term in terms:
+                frequency = counts.get(term)
+                if frequency:
+                    score += self.idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+            results.append(score)
+        return results
+
+
+def truncate_to_tokens(text: str, token_budget: int) -> str:
+    """Longest prefix of text within token_budget, cut at a line break when one is near the end."""
+    if count_tokens(text) <= token_budget:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle]) <= token_budget:
+            low = middle
+        else:
+            high = middle - 1
+    cut = text.rfind("\n", 0, low)
+    return text[:cut if cut > low // 2 else low].rstrip()
+
+
+def select_relevant_chunks(markdown: str, query: str, token_budget: int) -> str:
+    """Keep the chunks of a document that best match query, within token_budget.
+
+    Chunks are ranked with BM25 and returned in their original order. When
+    nothing matches, the beginning of the document is kept; when even the best
+    chunk is over budget, it is truncated to fit.
+    """
+    if count_tokens(markdown) <= token_budget:
+        return markdown
+    chunks = chunk_markdown(markdown)
+    if not chunks:
+        return ""
+    scores = BM25(chunks).scores(query)
+    ranked = sorted(range(len(chunks)), key=lambda i: (-scores[i], i))
+    selected, used = [], 0
+    for i in ranked:
+        size = count_tokens(chunks[i])
+        if used + size > token_budget:
+            continue
+        selected.append(i)
+        used += size
+    if not selected:
+        return truncate_to_tokens(chunks[ranked[0]], token_budget)
+    return "\n\n".join(chunks[i] for i in sorted(selected))
@@ -0,0 +1,301 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Optional
+
+from response_cache import get_cache_dir
+
+FINISHED_STATUSES = ("succeeded", "failed", "error")
+JOB_COLUMNS = "id, queue, spec, status, stages, result, question, usage, attempts, worker, created, started, finished"
+
+
+def lease_seconds() -> float:
+    """How long a claimed job stays with its worker without a heartbeat (JOB_LEASE_SECONDS)."""
+    return float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+
+def max_job_attempts() -> int:
+    """Claims a job gets before a job whose workers keep dying is marked as an error (JOB_MAX_ATTEMPTS)."""
+    return int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+
+def worker_name() -> str:
+    """Identifier for the calling worker thread, unique across processes and hosts."""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+class JobQueue(ABC):
+    """Persistent queue of generation jobs with per-stage checkpoints.
+
+    Jobs are dicts with id, queue, spec, status (queued, running, succeeded,
+    failed or error), stages ({stage: data} saved as the pipeline progresses),
+    result, question, usage, attempts and created/started/finished times. A
+    worker claims a job for lease_seconds() and keeps it with renew(); a job
+    whose lease runs out is handed to the next worker that asks, together with
+    its saved stages so the pipeline resumes where it stopped.
+    """
+
+    @abstractmethod
+    def enqueue(self, queue_name: str, spec: dict, job_id: Optional[str] = None) -> str:
+        """Add a job unless job_id already exists; returns the job id."""
+
+    @abstractmethod
+    def claim(self, queue_name: str, worker: str) -> Optional[dict]:
+        """Take the oldest queued (or abandoned) job in queue_name, or return None."""
+
+    @abstractmethod
+    def renew(self, job_id: str, worker: str, usage: Optional[dict] = None) -> bool:
+        """Extend the worker's lease; False when the job is no longer held by this worker."""
+
+    @abstractmethod
+    def save_stage(self, job_id: str, worker: str, stage: str, data: dict) -> bool:
+        """Checkpoint a stage; False when the job is no longer held by this worker."""
+
+    @abstractmethod
+    def set_question(self, job_id: str, question: Optional[str]) -> None:
+        ...
+
+    @abstractmethod
+    def finish(self, job_id: str, worker: str, status: str, result: dict) -> bool:
+        """Record the job's outcome; False when the job is no longer held by this worker."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def list_jobs(self, queue_name: str) -> list[dict]:
+        """Jobs in queue_name, newest first."""
+
+    @abstractmethod
+    def count(self, queue_name: str, status: str) -> int:
+        ...
+
+    @abstractmethod
+    def append_log(self, job_id: str, lines: list[str]) -> None:
+        ...
+
+    @abstractmethod
+    def read_log(self, job_id: str, start: int = 0, limit: Optional[int] = None) -> list[str]:
+        """Progress lines from index start on."""
+
+    @abstractmethod
+    def log_length(self, job_id: str) -> int:
+        ...
+
+
+class SQLiteJobQueue(JobQueue):
+    """JobQueue in a local SQLite file: no broker, safe across threads and processes on one host."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("JOB_QUEUE_PATH", os.path.join(get_cache_dir(), "jobs.sqlite3"))
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            # WAL lets progress readers run alongside the workers' writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, "
+                "queue TEXT NOT NULL, "
+                "spec TEXT NOT NULL, "
+                "status TEXT NOT NULL, "
+                "stages TEXT NOT NULL DEFAULT '{}', "
+                "result TEXT, "
+                "question TEXT, "
+                "usage TEXT, "
+                "attempts INTEGER NOT NULL DEFAULT 0, "
+                "worker TEXT, "
+                "lease_expires REAL, "
+                "created REAL NOT NULL, "
+                "started REAL, "
+                "finished REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_queue_status ON jobs (queue, status, created)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_logs ("
+                "job_id TEXT NOT NULL, "
+                "seq INTEGER NOT NULL, "
+                "line TEXT NOT NULL, "
+                "PRIMARY KEY (job_id, seq))"
+            )
+
+    @contextmanager
+    def _connect(self):
+        """Open the queue database, commit on success and always close it."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_to_job(row) -> dict:
+        job_id, queue_name, spec, status, stages, result, question, usage, attempts, worker, created, started, finished = row
+        return {
+            "id": job_id,
+            "queue": queue_name,
+            "spec": json.loads(spec),
+            "status": status,
+            "stages": json.loads(stages),
+            "result": json.loads(result) if result else None,
+            "question": question,
+            "usage": json.loads(usage) if usage else None,
+            "attempts": attempts,
+            "worker": worker,
+            "created": created,
+            "started": started,
+            "finished": finished,
+        }
+
+    def enqueue(self, queue_name: str, spec: dict, job_id: Optional[str] = None) -> str:
+        job_id = job_id or uuid.uuid4().hex[:12]
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO jobs (id, queue, spec, status, created) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, queue_name, json.dumps(spec), time.time()),
+            )
+        return job_id
+
+    def claim(self, queue_name: str, worker: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            # Take the write lock up front so two processes cannot claim the same job
+            conn.execute("BEGIN IMMEDIATE")
+            # A job whose workers keep dying (e.g. it crashes the process) is not retried forever
+            max_attempts = max_job_attempts()
+            conn.execute(
+                "UPDATE jobs SET status = 'error', finished = ?, lease_expires = NULL, result = ? "
+                "WHERE queue = ? AND status = 'running' AND lease_expires < ? AND attempts >= ?",
+                (now, json.dumps({"status": "error", "error": f"Worker stopped responding {max_attempts} times"}),
+                 queue_name, now, max_attempts),
+            )
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE queue = ? AND (status = 'queued' OR (status = 'running' AND lease_expires < ?)) "
+                "ORDER BY created LIMIT 1",
+                (queue_name, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, lease_expires = ?, attempts = attempts + 1, "
+                "question = NULL, started = COALESCE(started, ?) WHERE id = ?",
+                (worker, now + lease_seconds(), now, row[0]),
+            )
+            job = conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (row[0],)).fetchone()
+        return self._row_to_job(job)
+
+    def renew(self, job_id: str, worker: str, usage: Optional[dict] = None) -> bool:
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, usage = COALESCE(?, usage) WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time() + lease_seconds(), json.dumps(usage) if usage is not None else None, job_id, worker),
+            )
+        return cursor.rowcount == 1
+
+    def save_stage(self, job_id: str, worker: str, stage: str, data: dict) -> bool:
+        with self._lock, self._connect() as conn:
+            # Read and write the stages under one write lock so another process cannot interleave
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT stages FROM jobs WHERE id = ? AND worker = ? AND status = 'running'", (job_id, worker)
+            ).fetchone()
+            if row is None:
+                return False
+            stages = json.loads(row[0])
+            stages[stage] = data
+            conn.execute("UPDATE jobs SET stages = ? WHERE id = ?", (json.dumps(stages), job_id))
+        return True
+
+    def set_question(self, job_id: str, question: Optional[str]) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE jobs SET question = ? WHERE id = ?", (question, job_id))
+
+    def finish(self, job_id: str, worker: str, status: str, result: dict) -> bool:
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, usage = ?, question = NULL, lease_expires = NULL, finished = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (status, json.dumps(result), json.dumps(result.get("usage")), time.time(), job_id, worker),
+            )
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock, self._connect() as conn:
+            row = conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(self, queue_name: str) -> list[dict]:
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {JOB_COLUMNS} FROM jobs WHERE queue = ? ORDER BY created DESC", (queue_name,)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def count(self, queue_name: str, status: str) -> int:
+        with self._lock, self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE queue = ? AND status = ?", (queue_name, status)
+            ).fetchone()[0]
+
+    def append_log(self, job_id: str, lines: list[str]) -> None:
+        with self._lock, self._connect() as conn:
+            start = conn.execute("SELECT COUNT(*) FROM job_logs WHERE job_id = ?", (job_id,)).fetchone()[0]
+            conn.executemany(
+                "INSERT INTO job_logs (job_id, seq, line) VALUES (?, ?, ?)",
+                [(job_id, start + i, line) for i, line in enumerate(lines)],
+            )
+
+    def read_log(self, job_id: str, start: int = 0, limit: Optional[int] = None) -> list[str]:
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT line FROM job_logs WHERE job_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+                (job_id, start, -1 if limit is None else limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def log_length(self, job_id: str) -> int:
+        with self._lock, self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM job_logs WHERE job_id = ?", (job_id,)).fetchone()[0]
+
+
+JOB_QUEUE_BACKENDS = {"sqlite": SQLiteJobQueue}
+
+
+def get_job_queue() -> JobQueue:
+    """The job queue backend selected by JOB_QUEUE_BACKEND (default: sqlite)."""
+    backend = os.getenv("JOB_QUEUE_BACKEND", "sqlite").lower()
+    if backend not in JOB_QUEUE_BACKENDS:
+        raise ValueError(f"Unknown JOB_QUEUE_BACKEND {backend!r}, expected one of {sorted(JOB_QUEUE_BACKENDS)}")
+    return JOB_QUEUE_BACKENDS[backend]()
+
+
+@contextmanager
+def hold_lease(job_queue: JobQueue, job_id: str, worker: str, usage: Optional[dict] = None):
+    """Renew the worker's lease on a job in the background while the block runs (also saving usage)."""
+    stop = threading.Event()
+    interval = lease_seconds() / 4
+
+    def heartbeat() -> None:
+        while not stop.wait(interval):
+            try:
+                if not job_queue.renew(job_id, worker, usage):
+                    return
+            except Exception:
+                # A busy or briefly unavailable database must not end the heartbeat;
+                # the lease outlasts a few missed beats, so try again on the next one
+                continue
+
+    thread = threading.Thread(target=heartbeat, name=f"lease-{job_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
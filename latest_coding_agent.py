@@ -1,45 +1,321 @@
 from pydantic import BaseModel
-from openai import OpenAI
+from openai import OpenAI, BadRequestError
 import subprocess
 import os
 import shutil
 import tempfile
 from dotenv import load_dotenv
 from datetime import datetime
-import glob
 import time
+import asyncio
+import signal
 
 # Load environment variables
 load_dotenv()
 
-from openai_client import get_client
-from models import File, RequirementsGatheringEvent, CodeGenerationEvent, ProjectAnalysisEvent
+from openai_client import get_client, get_async_client, get_request_semaphore, run_async
+from models import File, RequirementsGatheringEvent, CodeGenerationEvent, ProjectAnalysisEvent, CodeRepairEvent, FileSummariesEvent
+from code_repair import build_repair_message, apply_repair
+from venv_manager import venv_pool_enabled, normalize_requirements, get_venv, assign_venv, project_venv, project_env
+from requirements_lock import install_is_current, record_install
+from readiness import wait_until_ready
+from port_allocator import allocate_port, release_port, release_port_on_exit, with_port, port_from_command
+from response_cache import cache_enabled, make_cache_key, get_cached_response, store_response, delete_response
+from code_stream import CodeGenerationStreamParser
+from structured_output import get_structured_output_mode, is_mode_error, downgrade_mode, build_request, read_response, parse_model_output
+from doc_ranker import docs_token_budget, select_relevant_chunks
+from project_index import list_projects, get_project, record_project
+from project_snapshot import snapshot_project, write_file
+from project_scanner import scan_project
+from project_retrieval import select_relevant_files, merge_excerpt
+from analysis_cache import project_fingerprint, get_file_summaries, store_file_summaries, get_cached_analysis, store_analysis
+from token_counter import count_tokens
+from context_window import compact_messages
+from usage_tracker import record_usage, record_cache_hit
+from concurrent.futures import ThreadPoolExecutor
 client = get_client()
 
 
-def get_event(message: list, base_model: type) -> BaseModel:
-    """Generate a response from OpenAI based on the conversation."""
+def get_event(message: list, base_model: type, use_cache: bool = True, store: bool = True) -> BaseModel:
+    """Generate a response from OpenAI based on the conversation.
+
+    Identical (model, messages, schema) requests are answered from the on-disk
+    response cache; pass use_cache=False or set DISABLE_RESPONSE_CACHE=1 to bypass it.
+    With store=False a fresh response is not cached (the caller caches it once
+    it is known to be good, see remember_generation).
+    """
     model_name = os.getenv("MODEL_NAME")
     # print("Model Name: ", model_name)
-    try:
-        completion = client.beta.chat.completions.parse(
-            model= model_name,
-            messages=message,
-            response_format=base_model,
+    cache_key = None
+    if use_cache and cache_enabled():
+        cache_key = make_cache_key(model_name, message, base_model)
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            record_cache_hit()
+            return base_model.model_validate_json(cached)
+    mode = get_structured_output_mode(client, model_name)
+    while True:
+        try:
+            if mode == "parse":
+                completion = client.beta.chat.completions.parse(
+                    model= model_name,
+                    messages=message,
+                    response_format=base_model,
+                )
+            else:
+                completion = client.chat.completions.create(
+                    model=model_name,
+                    **build_request(message, base_model, mode),
+                )
+            break
+        except BadRequestError as e:
+            # Only a rejected response format means the mode is unsupported; other
+            # errors (e.g. context length) say nothing about the provider
+            if not is_mode_error(e):
+                raise
+            # The provider rejected this mode; remember that and use the next one
+            mode = downgrade_mode(model_name, mode)
+            if mode is None:
+                raise
+    record_usage(getattr(completion, "usage", None))
+    response = read_response(completion, base_model)
+    # print(response)
+    if cache_key is not None and store:
+        store_response(cache_key, base_model.__name__, response.model_dump_json())
+    return response
+
+async def get_event_async(message: list, base_model: type, use_cache: bool = True, store: bool = True) -> BaseModel:
+    """Async counterpart of get_event using the pooled AsyncOpenAI client.
+
+    At most LLM_MAX_CONCURRENCY requests are in flight per event loop.
+    """
+    model_name = os.getenv("MODEL_NAME")
+    cache_key = None
+    if use_cache and cache_enabled():
+        cache_key = make_cache_key(model_name, message, base_model)
+        # SQLite I/O stays off the event loop
+        cached = await asyncio.to_thread(get_cached_response, cache_key)
+        if cached is not None:
+            record_cache_hit()
+            return base_model.model_validate_json(cached)
+    mode = await asyncio.to_thread(get_structured_output_mode, client, model_name)
+    async_client = get_async_client()
+    async with get_request_semaphore():
+        while True:
+            try:
+                if mode == "parse":
+                    completion = await async_client.beta.chat.completions.parse(
+                        model=model_name,
+                        messages=message,
+                        response_format=base_model,
+                    )
+                else:
+                    completion = await async_client.chat.completions.create(
+                        model=model_name,
+                        **build_request(message, base_model, mode),
+                    )
+                break
+            except BadRequestError as e:
+                if not is_mode_error(e):
+                    raise
+                mode = downgrade_mode(model_name, mode)
+                if mode is None:
+                    raise
+    record_usage(getattr(completion, "usage", None))
+    response = read_response(completion, base_model)
+    if cache_key is not None and store:
+        await asyncio.to_thread(store_response, cache_key, base_model.__name__, response.model_dump_json())
+    return response
+
+def get_events_concurrently(requests: list[tuple[list, type]], use_cache: bool = True) -> list:
+    """Run independent (message, base_model) requests concurrently and return results in order."""
+    async def run_all():
+        return await asyncio.gather(
+            *(get_event_async(message, base_model, use_cache=use_cache) for message, base_model in requests)
         )
+    return run_async(run_all())
+
+def streaming_enabled() -> bool:
+    """Return True unless streamed code generation is disabled via STREAM_CODE_GENERATION."""
+    return os.getenv("STREAM_CODE_GENERATION", "true").lower() not in ("0", "false", "no")
 
-        response = completion.choices[0].message.parsed
+def stream_code_generation(message: list, on_file, on_run_command=None, use_cache: bool = True, on_reset=None, log=print, store: bool = True) -> CodeGenerationEvent:
+    """Generate code with a streamed response, handing each File to on_file as soon as it is complete.
+
+    If the stream fails before anything was handed over, the code is requested
+    again without streaming. If it fails part way, on_reset() is called to undo
+    the partial output first (without on_reset the error is raised). Errors
+    raised by the callbacks themselves always propagate.
+    """
+    model_name = os.getenv("MODEL_NAME")
+    cache_key = None
+    if use_cache and cache_enabled():
+        cache_key = make_cache_key(model_name, message, CodeGenerationEvent)
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            record_cache_hit()
+            event = CodeGenerationEvent.model_validate_json(cached)
+            for file in event.generated_code:
+                on_file(file)
+            if on_run_command:
+                on_run_command(event.run_command)
+            return event
+
+    parser = CodeGenerationStreamParser()
+    dispatched, callback_failed = False, False
+
+    def dispatch(delta: str) -> None:
+        nonlocal dispatched, callback_failed
+        for item in parser.feed(delta):
+            dispatched = True
+            try:
+                if isinstance(item, File):
+                    on_file(item)
+                elif on_run_command:
+                    on_run_command(item)
+            except Exception:
+                callback_failed = True
+                raise
+
+    mode = get_structured_output_mode(client, model_name)
+    try:
+        if mode == "parse":
+            with client.beta.chat.completions.stream(
+                model=model_name,
+                messages=message,
+                response_format=CodeGenerationEvent,
+                # Streams only report token usage when asked to
+                stream_options={"include_usage": True},
+            ) as stream:
+                for chunk in stream:
+                    if chunk.type == "content.delta":
+                        dispatch(chunk.delta)
+                completion = stream.get_final_completion()
+            record_usage(getattr(completion, "usage", None))
+            event = read_response(completion, CodeGenerationEvent)
+        else:
+            stream = client.chat.completions.create(
+                model=model_name,
+                stream=True,
+                stream_options={"include_usage": True},
+                **build_request(message, CodeGenerationEvent, mode),
+            )
+            content, usage = [], None
+            for chunk in stream:
+                # Usage arrives in a final chunk without choices
+                usage = getattr(chunk, "usage", None) or usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    content.append(chunk.choices[0].delta.content)
+                    dispatch(chunk.choices[0].delta.content)
+            record_usage(usage)
+            event = parse_model_output("".join(content), CodeGenerationEvent)
     except Exception as e:
-        completion = client.beta.chat.completions.parse(
-            model= model_name,
-            messages=message,
-            response_format=base_model.model_json_schema()
-        )
-        response = completion.choices[0].message.content
-    # print(response)
-    return response
+        if callback_failed:
+            raise
+        if dispatched:
+            if on_reset is None:
+                raise
+            # Part of the old response is already on disk; drop it before writing the new one
+            log(f"Stream failed part way ({e}), discarding the partial output...")
+            on_reset()
+        # Provider cannot stream structured output; fall back to a regular request
+        log(f"Streaming unavailable ({e}), waiting for the full response...")
+        event = get_event(message, CodeGenerationEvent, use_cache=False)
+        for file in event.generated_code:
+            on_file(file)
+        if on_run_command:
+            on_run_command(event.run_command)
+        return event
+
+    # Hand over anything the incremental parser could not pick up
+    for file in event.generated_code[len(parser.files):]:
+        on_file(file)
+    if on_run_command and parser.run_command is None:
+        on_run_command(event.run_command)
+    if cache_key is not None and store:
+        store_response(cache_key, CodeGenerationEvent.__name__, event.model_dump_json())
+    return event
+
+def generation_cache_key(message: list) -> str | None:
+    """Response-cache key of a code generation request, or None when the cache is off."""
+    if not cache_enabled():
+        return None
+    return make_cache_key(os.getenv("MODEL_NAME"), message, CodeGenerationEvent)
+
+def remember_generation(cache_key: str | None, event: CodeGenerationEvent) -> None:
+    """Cache generated code once it has run, so only working projects are replayed."""
+    if cache_key is not None:
+        store_response(cache_key, CodeGenerationEvent.__name__, event.model_dump_json())
+
+def forget_generation(cache_key: str | None) -> None:
+    """Drop a cached generation whose project failed, so the next session asks the model again."""
+    if cache_key is not None:
+        delete_response(cache_key)
 
-def create_project_directory() -> str:
+def generate_project_files(message: list, project_dir: str, use_cache: bool = True, install: bool = True, log=print):
+    """Generate code into project_dir, writing each file as soon as it arrives.
+
+    Python files are syntax-checked on arrival and, when install is True, the
+    dependency installation starts in the background as soon as requirements.txt
+    is written. Returns the CodeGenerationEvent and the install future (or None).
+    The result is not cached; callers use remember_generation once it has run.
+    """
+    if not streaming_enabled():
+        event = get_event(message, CodeGenerationEvent, use_cache=use_cache, store=False)
+        create_files(project_dir, event.generated_code)
+        return event, None
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    install_future = None
+    written = []
+
+    def on_file(file: File) -> None:
+        nonlocal install_future
+        create_files(project_dir, [file])
+        written.append(file.name)
+        log(f"  📄 {file.name}")
+        if file.name.endswith(".py"):
+            try:
+                compile(file.content, file.name, "exec")
+            except SyntaxError as e:
+                log(f"  ⚠️ Syntax error in {file.name} (line {e.lineno}): {e.msg}")
+        if install and file.name == "requirements.txt" and install_future is None:
+            install_future = executor.submit(install_requirements, project_dir, log)
+
+    def on_run_command(run_command: str) -> None:
+        log(f"  💻 {run_command}")
+
+    def on_reset() -> None:
+        # Let an install started from the partial requirements.txt finish, then start over
+        nonlocal install_future
+        if install_future is not None:
+            if not install_future.cancel():
+                install_future.exception()  # wait for the running install
+            install_future = None
+        for name in written:
+            path = os.path.join(project_dir, name)
+            if os.path.isfile(path):
+                os.remove(path)
+        written.clear()
+
+    try:
+        event = stream_code_generation(message, on_file, on_run_command, use_cache=use_cache, on_reset=on_reset, log=log, store=False)
+    finally:
+        executor.shutdown(wait=False)
+    return event, install_future
+
+def repair_project(message: list, project_dir: str, error: str, log=print) -> CodeRepairEvent:
+    """Fix a failed project in place with search/replace edits instead of regenerating every file.
+
+    Raises ValueError when the returned edits do not apply to the current files.
+    """
+    repair_message = build_repair_message(message, read_project_files(project_dir), error)
+    event = get_event(repair_message, CodeRepairEvent, use_cache=False)
+    changed = apply_repair(project_dir, event)
+    log(f"Edited {len(changed)} files: {', '.join(changed)}")
+    return event
+
+def create_project_directory(suffix: str = "") -> str:
     """Create a unique project directory with timestamp and readable name."""
     # Get current timestamp for unique folder name
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -48,9 +324,16 @@ def create_project_directory() -> str:
     base_dir = os.path.join(os.getcwd(), "generated_projects")
     os.makedirs(base_dir, exist_ok=True)
     
-    # Create project directory with timestamp
-    project_dir = os.path.join(base_dir, f"project_{timestamp}")
-    os.makedirs(project_dir)
+    # Create project directory with timestamp (numbered when several start in the same second)
+    project_dir = os.path.join(base_dir, f"project_{timestamp}{suffix}")
+    counter = 1
+    while True:
+        try:
+            os.makedirs(project_dir)
+            break
+        except FileExistsError:
+            counter += 1
+            project_dir = os.path.join(base_dir, f"project_{timestamp}_{counter}{suffix}")
     
     # Create a README.md with instructions
     with open(os.path.join(project_dir, "README.md"), "w") as f:
@@ -65,15 +348,36 @@ def create_project_directory() -> str:
 def create_files(project_dir: str, generated_code: list[File]) -> None:
     """Create files in the project directory based on generated code."""
     for file in generated_code:
-        full_path = os.path.join(project_dir, file.name)
-        os.makedirs(os.path.dirname(full_path), exist_ok=True)
-        with open(full_path, "w") as f:
-            f.write(file.content)
+        # Replace rather than overwrite: files may be shared with an earlier version
+        write_file(os.path.join(project_dir, file.name), file.content)
 
-def install_requirements(project_dir: str) -> bool:
-    """Install dependencies if requirements.txt is present. Returns success status."""
+def install_requirements(project_dir: str, log=print) -> bool:
+    """Install dependencies if requirements.txt is present. Returns success status.
+
+    With the virtualenv pool enabled (USE_VENV_POOL, default on) the project is
+    bound to a shared environment keyed by its requirements fingerprint instead
+    of installing into the interpreter running the agent.
+    """
     requirements_path = os.path.join(project_dir, "requirements.txt")
+    requirements = normalize_requirements(requirements_path)
+    if venv_pool_enabled():
+        venv_dir = project_venv(project_dir)
+        if venv_dir and install_is_current(project_dir, requirements, venv_dir):
+            log("Requirements unchanged, skipping installation.")
+            return True
+        try:
+            venv_dir = get_venv(requirements_path)
+            assign_venv(project_dir, venv_dir)
+            record_install(project_dir, requirements, venv_dir)
+            log(f"Dependencies ready in environment {os.path.basename(venv_dir)}.")
+            return True
+        except subprocess.CalledProcessError as e:
+            log(f"Failed to install dependencies: {e.stderr}")
+            return False
     if os.path.exists(requirements_path):
+        if install_is_current(project_dir, requirements):
+            log("Requirements unchanged, skipping installation.")
+            return True
         try:
             subprocess.run(
                 ["pip", "install", "-r", requirements_path],
@@ -82,29 +386,25 @@ def install_requirements(project_dir: str) -> bool:
                 stderr=subprocess.PIPE,
                 text=True,
             )
-            print("Dependencies installed successfully.")
+            record_install(project_dir, requirements)
+            log("Dependencies installed successfully.")
             return True
         except subprocess.CalledProcessError as e:
-            print(f"Failed to install dependencies: {e.stderr}")
+            log(f"Failed to install dependencies: {e.stderr}")
             return False
     return True  # Return True if no requirements file (nothing to install)
 
 def get_application_url(run_command: str) -> str:
     """Determine the likely URL where the application will be available."""
     if "streamlit run" in run_command:
-        return "http://localhost:8501"
+        port = port_from_command(run_command, "8501")
+        return f"http://localhost:{port}"
     elif "uvicorn" in run_command:
-        # Extract port if specified
-        port = "8000"  # default
-        if "--port" in run_command:
-            parts = run_command.split()
-            try:
-                port_index = parts.index("--port") + 1
-                if port_index < len(parts):
-                    port = parts[port_index]
-            except ValueError:
-                pass
+        port = port_from_command(run_command, "8000")
         return f"http://localhost:{port}/docs"  # FastAPI docs endpoint
+    elif "http.server" in run_command:
+        port = port_from_command(run_command, "8000")
+        return f"http://localhost:{port}"
     return "Unknown application URL"
 
 def run_application(project_dir: str, run_command: str, timeout: int = 10) -> tuple[str | None, str | None]:
@@ -116,6 +416,7 @@ def run_application(project_dir: str, run_command: str, timeout: int = 10) -> tu
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True,
+            env=project_env(project_dir),
         )
         output, error = process.communicate(timeout=timeout)
         return output, error
@@ -139,6 +440,7 @@ def manage_application_process(project_dir: str, run_command: str) -> subprocess
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True,
+            env=project_env(project_dir),
             creationflags=subprocess.CREATE_NEW_PROCESS_GROUP
         )
     else:  # Unix/Linux/Mac
@@ -148,88 +450,285 @@ def manage_application_process(project_dir: str, run_command: str) -> subprocess
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True,
+            env=project_env(project_dir),
             preexec_fn=os.setsid
         )
     return process
 
-def find_existing_projects() -> list[str]:
-    """Find all existing generated projects."""
-    base_dir = os.path.join(os.getcwd(), "generated_projects")
-    if not os.path.exists(base_dir):
-        return []
-    
-    projects = glob.glob(os.path.join(base_dir, "project_*"))
-    # Sort by creation time (newest first)
-    return sorted(projects, key=os.path.getctime, reverse=True)
+def stop_process(process) -> None:
+    """Kill a process started in its own session together with every child it spawned.
+
+    Works for subprocess.Popen and asyncio subprocesses; servers such as uvicorn
+    and streamlit leave workers behind when only the parent is killed, so the
+    group is killed even when the parent has already exited.
+    """
+    if os.name == "nt" and process.returncode is not None:
+        return
+    try:
+        if os.name == "nt":
+            process.kill()
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+async def validate_candidate(project_dir: str, run_command: str, timeout: int = 10) -> tuple[bool, str | None]:
+    """Launch a generated project and report whether it started (web apps) or ran cleanly.
+
+    Web apps are started on a freshly allocated port so candidates never collide.
+    """
+    if "streamlit" in run_command.lower() or "uvicorn" in run_command.lower():
+        port = allocate_port()
+        try:
+            launch_command = with_port(run_command, port)
+            process = manage_application_process(project_dir, launch_command)
+            try:
+                return await asyncio.to_thread(wait_until_ready, process, get_application_url(launch_command), launch_command)
+            finally:
+                stop_process(process)
+        finally:
+            release_port(port)
+    process = await asyncio.create_subprocess_exec(
+        *run_command.split(),
+        cwd=project_dir,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=project_env(project_dir),
+        start_new_session=os.name != "nt",
+    )
+    try:
+        try:
+            _, error = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            return True, None
+        error = error.decode(errors="replace")
+        return not error, error or None
+    finally:
+        running = process.returncode is None
+        stop_process(process)
+        if running:
+            await process.wait()
+
+async def run_candidate(message: list, project_dir: str, index: int, use_cache: bool, log=print) -> tuple[bool, CodeGenerationEvent | None, str | None]:
+    """Generate, install and validate one candidate in its own directory and port."""
+    label = f"[candidate {index + 1}]"
+    try:
+        event = await get_event_async(message, CodeGenerationEvent, use_cache=use_cache, store=False)
+        create_files(project_dir, event.generated_code)
+        save_run_command(project_dir, event.run_command)
+        log(f"{label} Generated {len(event.generated_code)} files, run command: {event.run_command}")
+        # pip cannot be interrupted, so a cancelled candidate waits for its install before
+        # generate_best_of_n removes the directory
+        install = asyncio.ensure_future(asyncio.to_thread(install_requirements, project_dir, log))
+        try:
+            installed = await asyncio.shield(install)
+        except asyncio.CancelledError:
+            await asyncio.gather(install, return_exceptions=True)
+            raise
+        if not installed:
+            log(f"{label} ⚠️ Failed to install dependencies, but attempting to run anyway")
+        ok, error = await validate_candidate(project_dir, event.run_command)
+        log(f"{label} {'✅ passed' if ok else '❌ failed'}")
+        return ok, event, error
+    except Exception as e:
+        log(f"{label} ❌ Error: {e}")
+        return False, None, str(e)
+
+async def generate_best_of_n(message: list, n: int, use_cache: bool = True, log=print) -> tuple[str | None, CodeGenerationEvent | None, list[str]]:
+    """Generate n candidates concurrently and keep the first that passes validation.
+
+    Remaining candidates are cancelled and their directories removed. Returns
+    (project_dir, event, errors); project_dir is None when every candidate failed.
+    """
+    project_dirs = [create_project_directory(f"_candidate{i + 1}") for i in range(n)]
+    # Only the first candidate may come from the response cache; the rest need fresh samples
+    tasks = {
+        asyncio.create_task(run_candidate(message, project_dir, i, use_cache and i == 0, log)): project_dir
+        for i, project_dir in enumerate(project_dirs)
+    }
+    winner_dir, winner_event, errors = None, None, []
+    pending = set(tasks)
+    try:
+        while pending and winner_dir is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                ok, event, error = task.result()
+                if ok and winner_dir is None:
+                    winner_dir, winner_event = tasks[task], event
+                elif not ok:
+                    errors.append(error or "Unknown error")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for project_dir in project_dirs:
+            if project_dir != winner_dir:
+                shutil.rmtree(project_dir, ignore_errors=True)
+    return winner_dir, winner_event, errors
+
+def add_reference_docs(message: list, links: list[str], query: str, log=print, browser_pool=None) -> list:
+    """Scrape reference links in parallel and add the parts of each page relevant to query.
+
+    Pages that need a browser borrow one from browser_pool (long-lived callers
+    pass the process-wide pool) or from a pool that lives for this call.
+    Returns (message dict, link, full markdown) for each page so the docs can be
+    re-ranked with rerank_reference_docs once the requirements are known.
+    """
+    # selenium is only needed when a link is given, so the scraper is imported lazily
+    from scraper_doc import scrape_many
+
+    results = scrape_many(links, pool=browser_pool)
+    reference_docs = []
+    for link in links:
+        scraped_text = results.get(link) or ""
+        log(f"Scraped text from {link}:\n{scraped_text}")
+        doc_message = {"role": "user", "content": reference_doc_content(link, scraped_text, query, len(links))}
+        message.append(doc_message)
+        reference_docs.append((doc_message, link, scraped_text))
+    return reference_docs
+
+
+def reference_doc_content(link: str, scraped_text: str, query: str, doc_count: int = 1) -> str:
+    """Message text for a reference doc, trimmed to its share of DOCS_TOKEN_BUDGET."""
+    relevant_text = select_relevant_chunks(scraped_text, query, docs_token_budget() // max(doc_count, 1))
+    return f"Here is the reference link: {link} Docs \n{relevant_text}"
+
+
+def rerank_reference_docs(reference_docs: list, query: str) -> None:
+    """Re-select the doc chunks in the conversation against a new query (e.g. the gathered requirements)."""
+    for doc_message, link, scraped_text in reference_docs:
+        doc_message["content"] = reference_doc_content(link, scraped_text, query, len(reference_docs))
+
+
+def find_existing_projects(offset: int = 0, limit: int = 10) -> tuple[list[dict], int]:
+    """Return one page of existing generated projects (newest first) and the total count.
+
+    Listing reads the project index instead of opening every project directory.
+    """
+    return list_projects(offset, limit)
 
 def get_project_info(project_dir: str) -> dict:
     """Get basic information about a project."""
-    # Try to detect project type from run_command
-    run_command_path = os.path.join(project_dir, "run_command.txt")
-    project_type = "Unknown"
-    run_command = ""
-    
-    if os.path.exists(run_command_path):
-        with open(run_command_path, "r") as f:
-            run_command = f.read().strip()
-            if "streamlit" in run_command.lower():
-                project_type = "Streamlit"
-            elif "uvicorn" in run_command.lower() or "fastapi" in run_command.lower():
-                project_type = "FastAPI"
-    
-    # Get creation time
-    created_time = datetime.fromtimestamp(os.path.getctime(project_dir)).strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Get list of main files
-    python_files = glob.glob(os.path.join(project_dir, "*.py"))
-    python_files.extend(glob.glob(os.path.join(project_dir, "*/*.py")))
-    main_files = [os.path.relpath(f, project_dir) for f in python_files[:5]]  # List up to 5 Python files
-    
-    return {
-        "name": os.path.basename(project_dir),
-        "path": project_dir,
-        "type": project_type,
-        "created": created_time,
-        "run_command": run_command,
-        "main_files": main_files
-    }
+    info = get_project(project_dir)
+    if info is None:
+        # Not indexed yet (e.g. copied in by hand): read it once and remember it
+        record_project(project_dir)
+        info = get_project(project_dir)
+    return info
+
+def save_run_command(project_dir: str, run_command: str, parent: str | None = None) -> None:
+    """Write run_command.txt and record the project (and the version it came from) in the index."""
+    write_file(os.path.join(project_dir, "run_command.txt"), run_command)
+    record_project(project_dir, run_command, parent)
 
 def read_project_files(project_dir: str) -> list[File]:
-    """Read all relevant files from a project directory."""
-    files = []
-    
-    # Collect all Python files
-    python_files = glob.glob(os.path.join(project_dir, "**/*.py"), recursive=True)
-    
-    # Add requirements.txt if it exists
-    req_file = os.path.join(project_dir, "requirements.txt")
-    if os.path.exists(req_file):
-        python_files.append(req_file)
-    
-    # Add any HTML templates
-    template_files = glob.glob(os.path.join(project_dir, "**/*.html"), recursive=True)
-    
-    # Combine all files to read
-    all_files = python_files + template_files
-    
-    for file_path in all_files:
-        try:
-            with open(file_path, "r") as f:
-                content = f.read()
-                rel_path = os.path.relpath(file_path, project_dir)
-                files.append(File(name=rel_path, content=content))
-        except Exception as e:
-            print(f"Error reading file {file_path}: {e}")
-    
-    return files
+    """Read all relevant files from a project directory.
 
-def analyze_project(project_files: list[File]) -> dict:
-    """Send project files to AI for analysis."""
+    Virtualenvs, caches, node_modules and anything in .gitignore are skipped, as
+    are binary and oversized files; the total is capped at PROJECT_TOKEN_BUDGET.
+    """
+    return scan_project(project_dir)
+
+def _summary_name(name: str) -> str:
+    return name.strip().strip("`'\"").removeprefix("File:").strip().replace("\\", "/").removeprefix("./").lstrip("/")
+
+def match_summaries(files: list[File], event: FileSummariesEvent) -> dict:
+    """Map the summaries a model returned back to the requested file names.
+
+    Names are compared exactly, then with quoting and ./ prefixes removed, then
+    by a unique path suffix (e.g. app.py for src/app.py). Summaries that match
+    no requested file are dropped.
+    """
+    names = [file.name for file in files]
+    matched = {}
+    for item in event.summaries:
+        returned = _summary_name(item.name)
+        if item.name in names:
+            name = item.name
+        elif returned in names:
+            name = returned
+        else:
+            candidates = [
+                requested for requested in names
+                if returned and (requested.endswith(f"/{returned}") or returned.endswith(f"/{requested}"))
+            ]
+            name = candidates[0] if len(candidates) == 1 else None
+        if name and name not in matched:
+            matched[name] = item.summary
+    return matched
+
+def _summary_request(batch: list[File]) -> tuple[list, type]:
     message = [
         {
             "role": "system",
             "content": (
-                "You are a Python application analyzer. Examine the provided code files "
+                "You are a Python application analyzer. For each file provided, write a concise technical "
+                "summary of what it does: its key functions, classes, routes or UI elements, the data it "
+                "works with and what it depends on. Return one summary per file, using the file names as given."
+            ),
+        }
+    ]
+    for file in batch:
+        message.append({"role": "user", "content": f"File: {file.name}\n\n```\n{file.content}\n```"})
+    return message, FileSummariesEvent
+
+def summarize_files(project_files: list[File]) -> dict:
+    """Summarize files with the model, reusing cached summaries of unchanged files.
+
+    Files without a cached summary are sent in batches of about
+    SUMMARY_BATCH_TOKENS tokens, concurrently; files a batch left out are
+    retried once on their own. Returns {file name: summary}, without the files
+    that still got no summary.
+    """
+    summaries = get_file_summaries(project_files)
+    missing = [file for file in project_files if file.name not in summaries]
+    if not missing:
+        return summaries
+    print(f"Summarizing {len(missing)} new or changed files ({len(summaries)} cached)...")
+
+    batch_tokens = int(os.getenv("SUMMARY_BATCH_TOKENS", "12000"))
+    batches, batch, size = [], [], 0
+    for file in missing:
+        tokens = count_tokens(file.content)
+        if batch and size + tokens > batch_tokens:
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(file)
+        size += tokens
+    batches.append(batch)
+
+    new_summaries = {}
+    for batch, event in zip(batches, get_events_concurrently([_summary_request(batch) for batch in batches])):
+        new_summaries.update(match_summaries(batch, event))
+    skipped = [file for file in missing if file.name not in new_summaries]
+    if skipped:
+        print(f"Retrying {len(skipped)} files the model did not summarize...")
+        # A retried single-file request must not be answered from the response cache
+        events = get_events_concurrently([_summary_request([file]) for file in skipped], use_cache=False)
+        for file, event in zip(skipped, events):
+            new_summaries.update(match_summaries([file], event))
+    store_file_summaries(missing, new_summaries)
+    summaries.update(new_summaries)
+    return summaries
+
+def analyze_project(project_files: list[File]) -> ProjectAnalysisEvent:
+    """Analyze a project from per-file summaries.
+
+    Only new or changed files are summarized; an unchanged project reuses its
+    last analysis without calling the model at all.
+    """
+    fingerprint = project_fingerprint(project_files)
+    cached = get_cached_analysis(fingerprint)
+    if cached is not None:
+        print("Project unchanged since the last analysis, reusing it.")
+        return ProjectAnalysisEvent.model_validate_json(cached)
+
+    summaries = summarize_files(project_files)
+    message = [
+        {
+            "role": "system",
+            "content": (
+                "You are a Python application analyzer. Examine the provided summaries of the project's files "
                 "and provide a comprehensive analysis of the project. Identify the key features, "
                 "structure, and possible areas for enhancement. Be specific and technical. "
                 "Focus on understanding what the app does, how it works, and what could be improved or added."
@@ -237,15 +736,17 @@ def analyze_project(project_files: list[File]) -> dict:
         },
         {
             "role": "user", 
-            "content": "Here are the files from a Python project. Please analyze them:"
+            "content": "Here are summaries of the files from a Python project. Please analyze them:"
         }
     ]
     
-    # Add each file as a separate message for context
+    # Add each file's summary (files the model could not summarize are left out)
     for file in project_files:
+        if file.name not in summaries:
+            continue
         message.append({
             "role": "user", 
-            "content": f"File: {file.name}\n\n```python\n{file.content}\n```"
+            "content": f"File: {file.name}\n\n{summaries[file.name]}"
         })
     
     # Ask for structured analysis
@@ -256,8 +757,365 @@ def analyze_project(project_files: list[File]) -> dict:
     
     # Get analysis
     analysis = get_event(message, ProjectAnalysisEvent)
+    # An analysis missing some files is not reused; the next run summarizes them again
+    if all(file.name in summaries for file in project_files):
+        store_analysis(fingerprint, analysis.model_dump_json())
     return analysis
 
+PYTHON_APP_SYSTEM_PROMPT = (
+    "You are a specialized programming assistant that creates Python applications using either Streamlit or FastAPI. "
+    "Follow this process:\n"
+    "1. Gather all requirements by asking targeted questions about functionality, features, and design.\n"
+    "2. Once you have sufficient information, generate all necessary code files.\n"
+    "3. Provide clear instructions for running the application.\n\n"
+    "Guidelines:\n"
+    "- Ask focused, specific questions to clarify the user's needs\n"
+    "- Include all necessary imports and dependencies\n"
+    "- For Streamlit: Create interactive, well-structured UI with appropriate widgets\n"
+    "- For FastAPI: Implement proper API endpoints with documentation, validation, and error handling\n"
+    "- Always include a requirements.txt file with all necessary dependencies\n"
+    "- Ensure code is robust, well-commented, and follows best practices"
+)
+
+HTML_SITE_SYSTEM_PROMPT = (
+    "You are a specialized front-end development assistant that creates HTML/CSS/JavaScript websites. "
+    "Follow this process:\n"
+    "1. Gather all requirements by asking targeted questions about design, features, and content.\n"
+    "2. Once you have sufficient information, generate all necessary files (HTML, CSS, JS).\n"
+    "3. Provide clear instructions for viewing the website.\n\n"
+    "Guidelines:\n"
+    "- Ask focused questions about layout, color schemes, functionality and content\n"
+    "- Create a responsive design that works on mobile and desktop\n"
+    "- Include all necessary files and folder structure\n"
+    "- Use modern HTML5, CSS3 and JavaScript practices\n"
+    "- Provide a well-structured, semantic HTML document\n"
+    "- Include detailed comments in the code"
+)
+
+def ask_user(question: str) -> str:
+    """Answer provider for interactive sessions: read the answer from the terminal."""
+    return input("Your response: ")
+
+def start_conversation(query: str, project_type: str = "python", links: list[str] = (), log=print, browser_pool=None) -> tuple[list, list]:
+    """Initial messages for a new project ("python" or "html") plus its reference docs."""
+    system_prompt = HTML_SITE_SYSTEM_PROMPT if project_type == "html" else PYTHON_APP_SYSTEM_PROMPT
+    message = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": query},
+    ]
+    reference_docs = add_reference_docs(message, list(links), query, log, browser_pool) if links else []
+    return message, reference_docs
+
+def gather_requirements(message: list, query: str, reference_docs: list = (), answer_provider=ask_user, log=print, max_questions: int | None = None, use_cache: bool = True) -> RequirementsGatheringEvent:
+    """Ask the model's clarifying questions until it has all details, and return its final event.
+
+    answer_provider(question) supplies each answer. After max_questions answers
+    the model is told to proceed with what it has.
+    """
+    requirements_count = 0
+    while True:
+        event = get_event(message, RequirementsGatheringEvent, use_cache=use_cache)
+        if event.all_details_gathered:
+            log(f"\n✅ Requirements gathered ({requirements_count} questions answered)")
+            log(f"\nProject Type: {event.project_type}")
+            log(f"Requirements Summary:\n{event.requirements}")
+            # Keep the doc sections that matter for what will actually be built
+            rerank_reference_docs(reference_docs, f"{query}\n{event.requirements}")
+            return event
+
+        requirements_count += 1
+        log(f"\nQuestion {requirements_count}: {event.question}")
+        user_response = answer_provider(event.question)
+        if max_questions is not None and requirements_count >= max_questions:
+            user_response += "\n\nThat is all the information available. Fill in any remaining details yourself and mark all details as gathered."
+        message.append({"role": "assistant", "content": event.question})
+        message.append({"role": "user", "content": user_response})
+        # Keep the request size bounded: older Q&A collapses into the requirements summary
+        message[:] = compact_messages(message, event.requirements)
+
+def build_html_site(message: list, log=print, max_attempts: int = 3, keep_running: bool = True, resume: dict | None = None, on_generated=None, use_cache: bool = True) -> str | None:
+    """Generate a static site and check that it is served; returns its directory or None.
+
+    With keep_running the preview server is left running for the user. resume
+    ({"project_dir", "run_command"}) starts from files written by an earlier
+    run; on_generated(project_dir, run_command) is called once files are written.
+    use_cache=False never reads or writes the response cache.
+    """
+    log("\n=== Generating and Running Code ===")
+    resume_dir = resume["project_dir"] if resume and os.path.isdir(resume["project_dir"]) else None
+    for attempt in range(max_attempts):
+        log(f"\nAttempt {attempt + 1}/{max_attempts}")
+
+        cache_key = None
+        if resume_dir:
+            project_dir, resume_dir = resume_dir, None
+            event = CodeGenerationEvent(generated_code=[], run_command=resume["run_command"])
+            log(f"Resuming with the files already written to {project_dir}")
+        else:
+            # Create project directory and generate files into it as they arrive
+            # (retries skip the cache; the first generation is cached only once it is served)
+            project_dir = create_project_directory()
+            cache_key = generation_cache_key(message) if use_cache and attempt == 0 else None
+            event, _ = generate_project_files(message, project_dir, use_cache=use_cache and attempt == 0, install=False, log=log)
+            file_list = [file.name for file in event.generated_code]
+            log(f"Generated {len(file_list)} files: {', '.join(file_list)}")
+        # Save run command to file for reference
+        save_run_command(project_dir, event.run_command)
+        if on_generated:
+            on_generated(project_dir, event.run_command)
+        # Run the application with appropriate handling for web servers
+        log("\nStarting application...")
+        port = allocate_port()
+        try:
+            server_command = f"python -m http.server {port}"
+            log("Run command:", server_command)
+            process = manage_application_process(project_dir, server_command)
+            # Wait until the server answers (or fails) instead of sleeping blindly
+            app_url = get_application_url(server_command)
+            ready, error = wait_until_ready(process, app_url, server_command)
+            if not keep_running:
+                stop_process(process)
+            if not ready:
+                raise RuntimeError(error)
+            if keep_running:
+                # The preview server outlives this call, so its port is freed when it stops
+                release_port_on_exit(process, port)
+                port = None
+            log(f"✅ Application started successfully!")
+            if keep_running:
+                log(f"🌐 You can access it at: {app_url}")
+            log(f"📂 Project location: {project_dir}")
+            log(f"💻 To run it again: {event.run_command}")
+            remember_generation(cache_key, event)
+            return project_dir
+        except Exception as e:
+            log(f"❌ Error starting application: {str(e)}")
+        finally:
+            release_port(port)
+        forget_generation(cache_key)
+        # Only clean up if we're continuing to another attempt
+        if attempt < max_attempts - 1:
+            shutil.rmtree(project_dir)
+    return None
+
+def build_python_app(message: list, requirements_summary: str, log=print, max_attempts: int = 3, resume: dict | None = None, on_generated=None, use_cache: bool = True) -> str | None:
+    """Generate, install and run a Python app, refining it on errors; returns its directory or None.
+
+    resume, on_generated and use_cache work as in build_html_site.
+    """
+    log("\n=== Generating and Running Code ===")
+    best_of_n = int(os.getenv("BEST_OF_N", "1"))
+    repair_dir, last_error = None, None
+    resume_dir = resume["project_dir"] if resume and os.path.isdir(resume["project_dir"]) else None
+
+    for attempt in range(max_attempts):
+        log(f"\nAttempt {attempt + 1}/{max_attempts}")
+        # Errors from earlier attempts pile up in the conversation; keep it within budget
+        message[:] = compact_messages(message, requirements_summary)
+
+        if best_of_n > 1 and resume_dir is None:
+            # Generate and validate several candidates in parallel, keep the first that works
+            log(f"Generating {best_of_n} candidates in parallel...")
+            cache_key = generation_cache_key(message) if use_cache and attempt == 0 else None
+            project_dir, event, errors = run_async(
+                generate_best_of_n(message, best_of_n, use_cache=use_cache and attempt == 0, log=log)
+            )
+            if project_dir:
+                # The winner already saved its run command; report it like a single generation
+                if on_generated:
+                    on_generated(project_dir, event.run_command)
+                # Cache the winner under the first candidate's key so the next session replays it
+                remember_generation(cache_key, event)
+                app_url = get_application_url(event.run_command)
+                log(f"✅ Application started successfully!")
+                log(f"🌐 You can access it at: {app_url}")
+                log(f"📂 Project location: {project_dir}")
+                log(f"💻 To run it again: {event.run_command}")
+                return project_dir
+            log(f"❌ All {best_of_n} candidates failed")
+            forget_generation(cache_key)
+            message.append({
+                "role": "assistant",
+                "content": f"I generated code but encountered an error when running it."
+            })
+            message.append({
+                "role": "user",
+                "content": f"Please refine the code to resolve this error: {errors[0] if errors else 'Unknown error'}"
+            })
+            continue
+
+        project_dir = None
+        install_future = None
+        cache_key = None
+        if resume_dir:
+            # Files from an interrupted run are already on disk; go straight to install and run
+            project_dir, resume_dir = resume_dir, None
+            event = CodeGenerationEvent(generated_code=[], run_command=resume["run_command"])
+            log(f"Resuming with the files already written to {project_dir}")
+        elif repair_dir and last_error:
+            # Patch the failed project in place instead of regenerating every file
+            log("Repairing the previous attempt with targeted edits...")
+            try:
+                event = repair_project(message, repair_dir, last_error, log)
+                project_dir = repair_dir
+            except ValueError as e:
+                log(f"⚠️ Could not apply repair edits ({e}), regenerating from scratch")
+                shutil.rmtree(repair_dir)
+        repair_dir, last_error = None, None
+
+        if project_dir is None:
+            # Create project directory and generate files into it as they arrive;
+            # dependency installation starts as soon as requirements.txt is written
+            # (retries skip the cache; the first generation is cached only once it runs)
+            project_dir = create_project_directory()
+            cache_key = generation_cache_key(message) if use_cache and attempt == 0 else None
+            event, install_future = generate_project_files(message, project_dir, use_cache=use_cache and attempt == 0, log=log)
+            file_list = [file.name for file in event.generated_code]
+            log(f"Generated {len(file_list)} files: {', '.join(file_list)}")
+        log("Run command:", event.run_command)
+
+        # Save run command to file for reference
+        save_run_command(project_dir, event.run_command)
+        if on_generated:
+            on_generated(project_dir, event.run_command)
+
+        # Install requirements
+        log("\nInstalling dependencies...")
+        success = install_future.result() if install_future else install_requirements(project_dir, log)
+        if not success:
+            log("⚠️ Failed to install dependencies, but attempting to run anyway")
+
+        # Run the application with appropriate handling for web servers
+        log("\nStarting application...")
+        if "streamlit" in event.run_command.lower() or "uvicorn" in event.run_command.lower():
+            # For web apps, we'll start in background and show URL
+            # Launch on a free port so concurrent sessions don't collide
+            port = allocate_port()
+            try:
+                launch_command = with_port(event.run_command, port)
+                process = manage_application_process(project_dir, launch_command)
+                # Poll the app's port until it answers, crashes or times out
+                ready, error = wait_until_ready(process, get_application_url(launch_command), launch_command)
+                if not ready:
+                    log(f"❌ Application failed to start: {error}")
+                    last_error = error
+                    # Add code and error to conversation for refinement
+                    message.append({
+                        "role": "assistant",
+                        "content": f"I generated code but encountered an error when running it."
+                    })
+                    message.append({
+                        "role": "user",
+                        "content": f"Please refine the code to resolve this error: {error}"
+                    })
+                else:
+                    # Process is still running - likely success
+                    app_url = get_application_url(launch_command)
+                    log(f"✅ Application started successfully!")
+                    log(f"🌐 You can access it at: {app_url}")
+                    log(f"📂 Project location: {project_dir}")
+                    log(f"💻 To run it again: {event.run_command}")
+                    stop_process(process)  # Clean up the process and its workers
+                    remember_generation(cache_key, event)
+                    return project_dir
+            except Exception as e:
+                log(f"❌ Error starting application: {str(e)}")
+            finally:
+                release_port(port)
+        else:
+            # For non-web apps, run and capture output directly
+            output, error = run_application(project_dir, event.run_command)
+            if error:
+                log(f"❌ Error running application: {error}")
+                last_error = error
+                message.append({
+                    "role": "assistant",
+                    "content": f"I generated code but encountered an error when running it."
+                })
+                message.append({
+                    "role": "user",
+                    "content": f"Please refine the code to resolve this error: {error}"
+                })
+            else:
+                log(f"✅ Application ran successfully!")
+                log(f"📂 Project location: {project_dir}")
+                log(f"💻 To run it again: {event.run_command}")
+                remember_generation(cache_key, event)
+                return project_dir
+
+        forget_generation(cache_key)
+        if last_error:
+            # Keep the failed project so the next attempt can repair it in place
+            repair_dir = project_dir
+        elif attempt < max_attempts - 1:
+            # Only clean up if we're continuing to another attempt
+            shutil.rmtree(project_dir)
+    return None
+
+def run_pipeline(query: str, project_type: str = "python", links: list[str] = (), answer_provider=ask_user, log=print, max_questions: int | None = None, keep_running: bool = True, stages: dict | None = None, on_stage=None, browser_pool=None, use_cache: bool = True) -> dict:
+    """Run a new-project session end to end: requirements, generation, install and run.
+
+    project_type is "python" (Streamlit/FastAPI) or "html". Returns a result
+    record with status ("succeeded" or "failed"), project_dir and stage timings.
+
+    on_stage(stage, data) is called as each stage completes ("requirements",
+    then "generated" once files are on disk); passing the saved data back as
+    stages={stage: data} resumes an interrupted run after its last stage.
+    browser_pool is used to scrape links that need a browser. use_cache=False
+    bypasses the response cache for requirements and generation (batch runs
+    that measure the model want fresh answers).
+    """
+    stages = stages or {}
+    on_stage = on_stage or (lambda stage, data: None)
+    started = time.monotonic()
+    if "requirements" in stages:
+        saved = stages["requirements"]
+        message = stages.get("generated", saved)["message"]
+        event = RequirementsGatheringEvent(all_details_gathered=True, question="", project_type=saved["project_type"], requirements=saved["requirements"])
+        requirements_seconds = saved["seconds"]
+        log("Resuming with the requirements gathered earlier")
+    else:
+        message, reference_docs = start_conversation(query, project_type, links, log, browser_pool)
+        event = gather_requirements(message, query, reference_docs, answer_provider, log, max_questions, use_cache)
+        requirements_seconds = round(time.monotonic() - started, 2)
+        on_stage("requirements", {
+            "message": message,
+            "project_type": event.project_type,
+            "requirements": event.requirements,
+            "seconds": requirements_seconds,
+        })
+
+    def on_generated(project_dir: str, run_command: str) -> None:
+        on_stage("generated", {"project_dir": project_dir, "run_command": run_command, "message": message})
+
+    generation_started = time.monotonic()
+    max_attempts = 3
+    if project_type == "html":
+        project_dir = build_html_site(message, log, max_attempts, keep_running, stages.get("generated"), on_generated, use_cache)
+    else:
+        project_dir = build_python_app(message, event.requirements, log, max_attempts, stages.get("generated"), on_generated, use_cache)
+    generation_seconds = round(time.monotonic() - generation_started, 2)
+
+    # Final feedback
+    if project_dir:
+        log("\n=== Success! ===")
+        log(f"Your application has been generated and is ready to use.")
+        log(f"Location: {project_dir}")
+    else:
+        log(f"\n=== Unable to generate working code after {max_attempts} attempts ===")
+        log("Please try again with a more specific description or simpler requirements.")
+    return {
+        "status": "succeeded" if project_dir else "failed",
+        "project_dir": project_dir,
+        "project_type": event.project_type,
+        "requirements": event.requirements,
+        "timings": {
+            "requirements_seconds": requirements_seconds,
+            "generation_seconds": generation_seconds,
+            "total_seconds": round(requirements_seconds + generation_seconds, 2),
+        },
+    }
+
 def main():
     print("=" * 80)
     print("Python Application Generator")
@@ -272,135 +1130,56 @@ def main():
     choice = input("\nEnter your choice (1, 2 or 3): ").strip()
     
     if choice == "2":
-        # Find existing projects
-        projects = find_existing_projects()
+        # Find existing projects, one page at a time
+        page_size = int(os.getenv("PROJECTS_PAGE_SIZE", "10"))
+        offset = 0
+        projects, total = find_existing_projects(offset, page_size)
         
         if not projects:
             print("No existing projects found. Creating a new project instead.")
             choice = "1"
         else:
-            print("\nFound existing projects:")
-            for i, project_path in enumerate(projects):
-                info = get_project_info(project_path)
-                print(f"{i+1}. {info['name']} - {info['type']} project (Created: {info['created']})")
-                if info['main_files']:
-                    print(f"   Main files: {', '.join(info['main_files'])}")
-            
-            # Let user select a project
-            while True:
-                try:
-                    project_idx = int(input("\nSelect a project number to update (or 0 to create new): ")) - 1
+            selected_project = None
+            while selected_project is None and choice == "2":
+                print(f"\nFound existing projects ({offset + 1}-{offset + len(projects)} of {total}):")
+                for i, info in enumerate(projects):
+                    parent = f", updated from {info['parent']}" if info['parent'] else ""
+                    print(f"{offset + i + 1}. {info['name']} - {info['type']} project (Created: {info['created']}{parent})")
+                    if info['main_files']:
+                        print(f"   Main files: {', '.join(info['main_files'])}")
+                
+                # Let user select a project or move between pages
+                while True:
+                    answer = input("\nSelect a project number to update (0 to create new, n/p for next/previous page): ").strip().lower()
+                    if answer in ("n", "p"):
+                        new_offset = offset + page_size if answer == "n" else offset - page_size
+                        if 0 <= new_offset < total:
+                            offset = new_offset
+                            projects, total = find_existing_projects(offset, page_size)
+                            break
+                        print("No more pages in that direction.")
+                        continue
+                    try:
+                        project_idx = int(answer) - 1
+                    except ValueError:
+                        print("Please enter a number.")
+                        continue
                     if project_idx == -1:
                         choice = "1"
                         break
-                    elif 0 <= project_idx < len(projects):
+                    elif offset <= project_idx < offset + len(projects):
+                        selected_project = projects[project_idx - offset]["path"]
                         break
                     else:
                         print("Invalid selection. Please try again.")
-                except ValueError:
-                    print("Please enter a number.")
 
     if choice == "3":
         # HTML website generation
         query = input("What kind of website would you like to build? ")
         print("\nWebsite Description:", query)
-        
-        # Initialize conversation with HTML-specific system prompt
-        message = [
-            {
-                "role": "system",
-                "content": (
-                    "You are a specialized front-end development assistant that creates HTML/CSS/JavaScript websites. "
-                    "Follow this process:\n"
-                    "1. Gather all requirements by asking targeted questions about design, features, and content.\n"
-                    "2. Once you have sufficient information, generate all necessary files (HTML, CSS, JS).\n"
-                    "3. Provide clear instructions for viewing the website.\n\n"
-                    "Guidelines:\n"
-                    "- Ask focused questions about layout, color schemes, functionality and content\n"
-                    "- Create a responsive design that works on mobile and desktop\n"
-                    "- Include all necessary files and folder structure\n"
-                    "- Use modern HTML5, CSS3 and JavaScript practices\n"
-                    "- Provide a well-structured, semantic HTML document\n"
-                    "- Include detailed comments in the code"
-                ),
-            },
-            {"role": "user", "content": query},
-        ]
-
-        # Step 1: Gather requirements with progress feedback
-        # Step 1: Gather requirements with progress feedback
         print("\n=== Gathering Requirements ===")
         link = input("Any Reference link eg doc: ")
-        if len(link) > 0:
-            # seperate link by space
-            links = link.split()
-            # run the subprocess to extract the text from the link `python scraper.py "https:sumityadav.com.np/biography"`
-            for link in links:
-                scraped_text = subprocess.run(["python", "scraper_doc.py", link], capture_output=True, text=True).stdout
-                # add the link to the message
-                print(f"Scraped text from {link}:\n{scraped_text}")
-                # add the link to the message
-                message.append({"role": "user", "content": f"Here is the reference link: {link} Docs \n{scraped_text}"})
-        requirements_count = 0
-        while True:
-            event = get_event(message, RequirementsGatheringEvent)
-            if event.all_details_gathered:
-                print(f"\n✅ Requirements gathered ({requirements_count} questions answered)")
-                print(f"\nProject Type: {event.project_type}")
-                print(f"Requirements Summary:\n{event.requirements}")
-                break
-                
-            requirements_count += 1
-            print(f"\nQuestion {requirements_count}: {event.question}")
-            user_response = input("Your response: ")
-            message.append({"role": "assistant", "content": event.question})
-            message.append({"role": "user", "content": user_response})
-
-        # Step 2: Generate and refine code with improved feedback
-        print("\n=== Generating and Running Code ===")
-        max_attempts = 3
-        final_project_dir = None
-        for attempt in range(max_attempts):
-            print(f"\nAttempt {attempt + 1}/{max_attempts}")
-            
-            # Generate code
-            event = get_event(message, CodeGenerationEvent)
-            file_list = [file.name for file in event.generated_code]
-            print(f"Generated {len(file_list)} files: {', '.join(file_list)}")
-            print("Run command:", "python -m http.server 8000")
-            # Create project directory and files
-            project_dir = create_project_directory()
-            create_files(project_dir, event.generated_code)
-            # Save run command to file for reference
-            with open(os.path.join(project_dir, "run_command.txt"), "w") as f:
-                f.write(event.run_command)
-            # Run the application with appropriate handling for web servers
-            print("\nStarting application...")
-            try:
-                manage_application_process(project_dir, "python -m http.server 8000")
-                # Wait briefly to catch immediate errors
-                time.sleep(2)
-                # Process is still running - likely success
-                app_url = get_application_url(event.run_command)
-                print(f"✅ Application started successfully!")
-                print(f"🌐 You can access it at: {app_url}")
-                print(f"📂 Project location: {project_dir}")
-                print(f"💻 To run it again: {event.run_command}")
-                final_project_dir = project_dir
-                break
-            except Exception as e:
-                print(f"❌ Error starting application: {str(e)}")
-            # Only clean up if we're continuing to another attempt
-            if attempt < max_attempts - 1:
-                shutil.rmtree(project_dir)
-        # Final feedback
-        if final_project_dir:
-            print("\n=== Success! ===")
-            print(f"Your application has been generated and is ready to use.")
-            print(f"Location: {final_project_dir}")
-        else:
-            print(f"\n=== Unable to generate working code after {max_attempts} attempts ===")
-            print("Please try again with a more specific description or simpler requirements.")
+        run_pipeline(query, "html", link.split())
         print("Exiting...")
         print("=" * 80)
         print("Thank you for using the Python Application Generator!")
@@ -413,154 +1192,11 @@ def main():
         # Get initial user query
         query = input("What would you like to build today? (Streamlit app or FastAPI service): ")
         print("\nProject Description:", query)
-
-        # Initialize conversation with more detailed system prompt
-        message = [
-            {
-                "role": "system",
-                "content": (
-                    "You are a specialized programming assistant that creates Python applications using either Streamlit or FastAPI. "
-                    "Follow this process:\n"
-                    "1. Gather all requirements by asking targeted questions about functionality, features, and design.\n"
-                    "2. Once you have sufficient information, generate all necessary code files.\n"
-                    "3. Provide clear instructions for running the application.\n\n"
-                    "Guidelines:\n"
-                    "- Ask focused, specific questions to clarify the user's needs\n"
-                    "- Include all necessary imports and dependencies\n"
-                    "- For Streamlit: Create interactive, well-structured UI with appropriate widgets\n"
-                    "- For FastAPI: Implement proper API endpoints with documentation, validation, and error handling\n"
-                    "- Always include a requirements.txt file with all necessary dependencies\n"
-                    "- Ensure code is robust, well-commented, and follows best practices"
-                ),
-            },
-            {"role": "user", "content": query},
-        ]
-
-        # Step 1: Gather requirements with progress feedback
         print("\n=== Gathering Requirements ===")
         link = input("Any Reference link eg doc: ")
-        if len(link) > 0:
-            # seperate link by space
-            links = link.split()
-            # run the subprocess to extract the text from the link `python scraper.py "https:sumityadav.com.np/biography"`
-            for link in links:
-                scraped_text = subprocess.run(["python", "scraper_doc.py", link], capture_output=True, text=True).stdout
-                # add the link to the message
-                print(f"Scraped text from {link}:\n{scraped_text}")
-                # add the link to the message
-                message.append({"role": "user", "content": f"Here is the reference link: {link} Docs \n{scraped_text}"})
-        requirements_count = 0
-        while True:
-            event = get_event(message, RequirementsGatheringEvent)
-            if event.all_details_gathered:
-                print(f"\n✅ Requirements gathered ({requirements_count} questions answered)")
-                print(f"\nProject Type: {event.project_type}")
-                print(f"Requirements Summary:\n{event.requirements}")
-                break
-                
-            requirements_count += 1
-            print(f"\nQuestion {requirements_count}: {event.question}")
-            user_response = input("Your response: ")
-            message.append({"role": "assistant", "content": event.question})
-            message.append({"role": "user", "content": user_response})
-            
+        run_pipeline(query, "python", link.split())
 
-        # Step 2: Generate and refine code with improved feedback
-        print("\n=== Generating and Running Code ===")
-        max_attempts = 3
-        final_project_dir = None
-        
-        for attempt in range(max_attempts):
-            print(f"\nAttempt {attempt + 1}/{max_attempts}")
-            
-            # Generate code
-            event = get_event(message, CodeGenerationEvent)
-            file_list = [file.name for file in event.generated_code]
-            print(f"Generated {len(file_list)} files: {', '.join(file_list)}")
-            print("Run command:", event.run_command)
-
-            # Create project directory and files
-            project_dir = create_project_directory()
-            create_files(project_dir, event.generated_code)
-            
-            # Save run command to file for reference
-            with open(os.path.join(project_dir, "run_command.txt"), "w") as f:
-                f.write(event.run_command)
-            
-            # Install requirements
-            print("\nInstalling dependencies...")
-            success = install_requirements(project_dir)
-            if not success:
-                print("⚠️ Failed to install dependencies, but attempting to run anyway")
-            
-            # Run the application with appropriate handling for web servers
-            print("\nStarting application...")
-            if "streamlit" in event.run_command.lower() or "uvicorn" in event.run_command.lower():
-                # For web apps, we'll start in background and show URL
-                try:
-                    process = manage_application_process(project_dir, event.run_command)
-                    # Wait briefly to catch immediate errors
-                    time.sleep(2)
-                    if process.poll() is not None:
-                        # Process exited quickly - likely an error
-                        _, error = process.communicate()
-                        print(f"❌ Application failed to start: {error}")
-                        # Add code and error to conversation for refinement
-                        message.append({
-                            "role": "assistant",
-                            "content": f"I generated code but encountered an error when running it."
-                        })
-                        message.append({
-                            "role": "user",
-                            "content": f"Please refine the code to resolve this error: {error}"
-                        })
-                    else:
-                        # Process is still running - likely success
-                        app_url = get_application_url(event.run_command)
-                        print(f"✅ Application started successfully!")
-                        print(f"🌐 You can access it at: {app_url}")
-                        print(f"📂 Project location: {project_dir}")
-                        print(f"💻 To run it again: {event.run_command}")
-                        final_project_dir = project_dir
-                        process.terminate()  # Clean up the process
-                        break
-                except Exception as e:
-                    print(f"❌ Error starting application: {str(e)}")
-            else:
-                # For non-web apps, run and capture output directly
-                output, error = run_application(project_dir, event.run_command)
-                if error:
-                    print(f"❌ Error running application: {error}")
-                    message.append({
-                        "role": "assistant",
-                        "content": f"I generated code but encountered an error when running it."
-                    })
-                    message.append({
-                        "role": "user",
-                        "content": f"Please refine the code to resolve this error: {error}"
-                    })
-                else:
-                    print(f"✅ Application ran successfully!")
-                    print(f"📂 Project location: {project_dir}")
-                    print(f"💻 To run it again: {event.run_command}")
-                    final_project_dir = project_dir
-                    break
-                    
-            # Only clean up if we're continuing to another attempt
-            if attempt < max_attempts - 1:
-                shutil.rmtree(project_dir)
-        
-        # Final feedback
-        if final_project_dir:
-            print("\n=== Success! ===")
-            print(f"Your application has been generated and is ready to use.")
-            print(f"Location: {final_project_dir}")
-        else:
-            print(f"\n=== Unable to generate working code after {max_attempts} attempts ===")
-            print("Please try again with a more specific description or simpler requirements.")
-            
     else:  # Update existing project
-        selected_project = projects[project_idx]
         project_info = get_project_info(selected_project)
         
         print(f"\n=== Analyzing Project: {project_info['name']} ===")
@@ -605,11 +1241,33 @@ def main():
             {"role": "user", "content": f"Project Structure:\n{analysis.project_structure}\n\nMain Features:\n{analysis.main_features}"},
         ]
         
-        # Add each file as context
-        for file in project_files:
+        # Add the code relevant to this update (and what it uses) as context;
+        # the rest of the project is described by its cached summaries
+        context_files, excerpted = select_relevant_files(project_files, update_query, project_info["run_command"])
+        print(f"Including {len(context_files)} of {len(project_files)} files relevant to the update ({len(excerpted)} as excerpts)")
+        for file in context_files:
+            label = f"File: {file.name} (excerpt, other code omitted)" if file.name in excerpted else f"File: {file.name}"
             message.append({
                 "role": "user", 
-                "content": f"File: {file.name}\n\n```python\n{file.content}\n```"
+                "content": f"{label}\n\n```python\n{file.content}\n```"
+            })
+        if excerpted:
+            message.append({
+                "role": "user",
+                "content": (
+                    "Files marked as excerpts are only partly shown. To change one, return only the complete "
+                    "top-level functions and classes you change or add, plus any new imports; "
+                    "they are merged into the full file by name."
+                )
+            })
+        context_names = {file.name for file in context_files}
+        other_files = [file for file in project_files if file.name not in context_names]
+        if other_files:
+            summaries = get_file_summaries(other_files)
+            overview = "\n".join(f"- {file.name}: {summaries.get(file.name, 'not shown')}" for file in other_files)
+            message.append({
+                "role": "user",
+                "content": f"Other project files (not shown, leave them unchanged unless the update requires it):\n{overview}"
             })
         
         # Add update request
@@ -620,7 +1278,9 @@ def main():
         
         # Generate updated code
         print("\n=== Generating Updates ===")
-        event = get_event(message, CodeGenerationEvent)
+        # The update is cached only once it runs, so a broken one is not replayed
+        cache_key = generation_cache_key(message)
+        event = get_event(message, CodeGenerationEvent, store=False)
         file_list = [file.name for file in event.generated_code]
         print(f"Generated/Updated {len(file_list)} files: {', '.join(file_list)}")
         print("Run command:", event.run_command)
@@ -629,15 +1289,25 @@ def main():
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         updated_project_dir = f"{selected_project}_updated_{timestamp}"
         
-        # Copy original project as base
-        shutil.copytree(selected_project, updated_project_dir)
+        # Snapshot the original project as base: unchanged files are shared, not copied
+        snapshot_project(selected_project, updated_project_dir)
         
-        # Apply updates (overwrite existing files and add new ones)
-        create_files(updated_project_dir, event.generated_code)
+        # Merge changes to excerpted files into their full source, then apply
+        # the updates (overwrite existing files and add new ones)
+        originals = {file.name: file.content for file in project_files}
+        updated_files = []
+        for file in event.generated_code:
+            if file.name in excerpted:
+                try:
+                    file = File(name=file.name, content=merge_excerpt(originals[file.name], file.content))
+                except ValueError as e:
+                    print(f"⚠️ Could not merge the changes to {file.name}, keeping it unchanged: {e}")
+                    continue
+            updated_files.append(file)
+        create_files(updated_project_dir, updated_files)
         
-        # Update run command if it changed
-        with open(os.path.join(updated_project_dir, "run_command.txt"), "w") as f:
-            f.write(event.run_command)
+        # Update run command if it changed and link the new version to its parent
+        save_run_command(updated_project_dir, event.run_command, parent=selected_project)
         
         # Install requirements
         print("\nInstalling dependencies...")
@@ -647,26 +1317,31 @@ def main():
         
         # Run the updated application
         print("\nStarting updated application...")
+        worked = False
         if "streamlit" in event.run_command.lower() or "uvicorn" in event.run_command.lower():
             # For web apps, we'll start in background and show URL
+            # Launch on a free port so concurrent sessions don't collide
+            port = allocate_port()
             try:
-                process = manage_application_process(updated_project_dir, event.run_command)
-                # Wait briefly to catch immediate errors
-                time.sleep(2)
-                if process.poll() is not None:
-                    # Process exited quickly - likely an error
-                    _, error = process.communicate()
+                launch_command = with_port(event.run_command, port)
+                process = manage_application_process(updated_project_dir, launch_command)
+                # Poll the app's port until it answers, crashes or times out
+                ready, error = wait_until_ready(process, get_application_url(launch_command), launch_command)
+                if not ready:
                     print(f"❌ Updated application failed to start: {error}")
                 else:
                     # Process is still running - likely success
-                    app_url = get_application_url(event.run_command)
+                    app_url = get_application_url(launch_command)
                     print(f"✅ Updated application started successfully!")
                     print(f"🌐 You can access it at: {app_url}")
                     print(f"📂 Updated project location: {updated_project_dir}")
                     print(f"💻 To run it again: {event.run_command}")
-                    process.terminate()  # Clean up the process
+                    stop_process(process)  # Clean up the process and its workers
+                    worked = True
             except Exception as e:
                 print(f"❌ Error starting updated application: {str(e)}")
+            finally:
+                release_port(port)
         else:
             # For non-web apps, run and capture output directly
             output, error = run_application(updated_project_dir, event.run_command)
@@ -676,6 +1351,11 @@ def main():
                 print(f"✅ Updated application ran successfully!")
                 print(f"📂 Updated project location: {updated_project_dir}")
                 print(f"💻 To run it again: {event.run_command}")
+                worked = True
+        if worked:
+            remember_generation(cache_key, event)
+        else:
+            forget_generation(cache_key)
         
         print("\n=== Update Summary ===")
         print(f"Original project: {selected_project}")
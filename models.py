@@ -18,4 +18,20 @@ class ProjectAnalysisEvent(BaseModel):
     project_structure: str  # Description of project structure and key files
     project_type: str  # "Streamlit" or "FastAPI"
     main_features: str  # Summary of main features
-    suggested_updates: list[str]  # Suggested potential updates
\ No newline at end of file
+    suggested_updates: list[str]  # Suggested potential updates
+
+class FileEdit(BaseModel):
+    name: str  # Path of the file to change (or create)
+    search: str  # Exact text currently in the file; empty to replace the whole file
+    replace: str  # Text to put in its place
+
+class CodeRepairEvent(BaseModel):
+    edits: list[FileEdit]  # Minimal search/replace edits against existing files
+    run_command: str  # Command to run the application
+
+class FileSummary(BaseModel):
+    name: str  # Path of the file as given
+    summary: str  # What the file does: key functions, classes, routes, UI elements and dependencies
+
+class FileSummariesEvent(BaseModel):
+    summaries: list[FileSummary]  # One summary per file provided
@@ -1,11 +1,88 @@
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+import asyncio
+import atexit
 import os
+import threading
+import weakref
+import httpx
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Async clients and semaphores are bound to the event loop that created them
+_async_clients = weakref.WeakKeyDictionary()
+_semaphores = weakref.WeakKeyDictionary()
+
+def _http_limits() -> httpx.Limits:
+    """Connection pool limits shared by the sync and async clients."""
+    max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_SECONDS", "60")),
+    )
+
 def get_client():
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("BASE_URL_OPENAI"))
+    client = OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=os.getenv("BASE_URL_OPENAI"),
+        http_client=DefaultHttpxClient(limits=_http_limits()),
+    )
     return client
 
+def get_async_client() -> AsyncOpenAI:
+    """Return the AsyncOpenAI client for the running event loop, reusing its keep-alive connection pool."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("BASE_URL_OPENAI"),
+            http_client=DefaultAsyncHttpxClient(limits=_http_limits()),
+        )
+        _async_clients[loop] = client
+    return client
+
+def get_request_semaphore() -> asyncio.Semaphore:
+    """Return the semaphore capping concurrent LLM requests (LLM_MAX_CONCURRENCY) on the running loop."""
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(int(os.getenv("LLM_MAX_CONCURRENCY", "4")))
+        _semaphores[loop] = semaphore
+    return semaphore
+
+async def close_async_client() -> None:
+    """Close the running loop's AsyncOpenAI client and its connections."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+# Synchronous callers share one long-lived loop, so its client and connection pool are reused
+_loop = None
+_loop_lock = threading.Lock()
+
+def _shutdown_loop() -> None:
+    try:
+        asyncio.run_coroutine_threadsafe(close_async_client(), _loop).result(timeout=5)
+    finally:
+        _loop.call_soon_threadsafe(_loop.stop)
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-event-loop", daemon=True).start()
+            atexit.register(_shutdown_loop)
+        return _loop
+
+def run_async(coro):
+    """Run a coroutine on the shared background event loop from synchronous code and return its result.
+
+    Works from any thread, including one that is already running its own loop
+    (which is blocked until the result is ready). Context variables of the
+    caller are visible to the coroutine. The loop's client is closed at exit.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
@@ -0,0 +1,77 @@
+import socket
+import threading
+
+_lock = threading.Lock()
+_reserved = set()
+
+
+def allocate_port() -> int:
+    """Hand out a free local TCP port that no other launch in this process is using."""
+    with _lock:
+        while True:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                sock.bind(("127.0.0.1", 0))
+                port = sock.getsockname()[1]
+            if port not in _reserved:
+                _reserved.add(port)
+                return port
+
+
+def release_port(port: int | None) -> None:
+    """Return a port to the allocator once the app using it has stopped."""
+    with _lock:
+        _reserved.discard(port)
+
+
+def release_port_on_exit(process, port: int) -> None:
+    """Release a port once a process left running in the background exits."""
+    def wait_and_release() -> None:
+        process.wait()
+        release_port(port)
+    threading.Thread(target=wait_and_release, name=f"port-{port}", daemon=True).start()
+
+
+def _port_flag(run_command: str) -> str | None:
+    if "streamlit" in run_command:
+        return "--server.port"
+    if "uvicorn" in run_command:
+        return "--port"
+    return None
+
+
+def with_port(run_command: str, port: int) -> str:
+    """Return run_command rewritten (or extended) so the server listens on the given port."""
+    parts = run_command.split()
+    if "http.server" in run_command:
+        if parts and parts[-1].isdigit():
+            parts[-1] = str(port)
+        else:
+            parts.append(str(port))
+        return " ".join(parts)
+    flag = _port_flag(run_command)
+    if flag is None:
+        return run_command
+    for i, part in enumerate(parts):
+        if part == flag and i + 1 < len(parts):
+            parts[i + 1] = str(port)
+            return " ".join(parts)
+        if part.startswith(f"{flag}="):
+            parts[i] = f"{flag}={port}"
+            return " ".join(parts)
+    # Keep script arguments after a bare "--" (streamlit run app.py -- args) untouched
+    insert_at = parts.index("--") if "--" in parts else len(parts)
+    return " ".join(parts[:insert_at] + [flag, str(port)] + parts[insert_at:])
+
+
+def port_from_command(run_command: str, default: str) -> str:
+    """Read the port a run command asks for, falling back to the server's default."""
+    parts = run_command.split()
+    if "http.server" in run_command:
+        return parts[-1] if parts and parts[-1].isdigit() else default
+    flag = _port_flag(run_command)
+    for i, part in enumerate(parts):
+        if part == flag and i + 1 < len(parts):
+            return parts[i + 1]
+        if flag and part.startswith(f"{flag}="):
+            return part.split("=", 1)[1]
+    return default
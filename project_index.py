@@ -0,0 +1,158 @@
+import glob
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+INDEX_FILE = "projects.sqlite3"
+MAX_MAIN_FILES = 5
+
+_lock = threading.Lock()
+
+
+def projects_base_dir() -> str:
+    """Directory holding generated projects (generated_projects/ under the working directory)."""
+    return os.path.join(os.getcwd(), "generated_projects")
+
+
+@contextmanager
+def _connect():
+    """Open the project index, commit on success and always close it."""
+    base_dir = projects_base_dir()
+    os.makedirs(base_dir, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(base_dir, INDEX_FILE), timeout=30)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS projects ("
+        "name TEXT PRIMARY KEY, "
+        "type TEXT NOT NULL, "
+        "created REAL NOT NULL, "
+        "run_command TEXT NOT NULL, "
+        "main_files TEXT NOT NULL, "
+        "parent TEXT)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_projects_created ON projects (created)")
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def project_type_from_command(run_command: str) -> str:
+    """Detect the project type from its run command."""
+    run_command = run_command.lower()
+    if "streamlit" in run_command:
+        return "Streamlit"
+    if "uvicorn" in run_command or "fastapi" in run_command:
+        return "FastAPI"
+    if "http.server" in run_command:
+        return "HTML"
+    return "Unknown"
+
+
+def _main_files(project_dir: str) -> list[str]:
+    python_files = glob.glob(os.path.join(project_dir, "*.py"))
+    python_files.extend(glob.glob(os.path.join(project_dir, "*/*.py")))
+    return [os.path.relpath(f, project_dir) for f in sorted(python_files)[:MAX_MAIN_FILES]]
+
+
+def _read_run_command(project_dir: str) -> str:
+    try:
+        with open(os.path.join(project_dir, "run_command.txt"), "r") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def _row_to_info(row) -> dict:
+    name, project_type, created, run_command, main_files, parent = row
+    return {
+        "name": name,
+        "path": os.path.join(projects_base_dir(), name),
+        "type": project_type,
+        "created": datetime.fromtimestamp(created).strftime("%Y-%m-%d %H:%M:%S"),
+        "run_command": run_command,
+        "main_files": json.loads(main_files),
+        "parent": parent,
+    }
+
+
+def _upsert(conn: sqlite3.Connection, project_dir: str, run_command: str, parent: Optional[str]) -> None:
+    name = os.path.basename(project_dir)
+    existing = conn.execute("SELECT created, parent FROM projects WHERE name = ?", (name,)).fetchone()
+    created = existing[0] if existing else os.path.getctime(project_dir)
+    parent = parent or (existing[1] if existing else None)
+    conn.execute(
+        "INSERT OR REPLACE INTO projects (name, type, created, run_command, main_files, parent) VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            name,
+            project_type_from_command(run_command),
+            created,
+            run_command,
+            json.dumps(_main_files(project_dir)),
+            os.path.basename(parent) if parent else None,
+        ),
+    )
+
+
+def record_project(project_dir: str, run_command: Optional[str] = None, parent: Optional[str] = None) -> None:
+    """Add or refresh a project's entry; parent is the project it was updated from.
+
+    When run_command is None it is read from the project's run_command.txt.
+    """
+    if run_command is None:
+        run_command = _read_run_command(project_dir)
+    with _lock, _connect() as conn:
+        _upsert(conn, project_dir, run_command, parent)
+
+
+def _sync(conn: sqlite3.Connection) -> None:
+    """Drop entries whose directory is gone and index projects created before the index existed."""
+    on_disk = {
+        os.path.basename(path)
+        for path in glob.glob(os.path.join(projects_base_dir(), "project_*"))
+        if os.path.isdir(path)
+    }
+    indexed = {row[0] for row in conn.execute("SELECT name FROM projects")}
+    for name in indexed - on_disk:
+        conn.execute("DELETE FROM projects WHERE name = ?", (name,))
+    for name in on_disk - indexed:
+        project_dir = os.path.join(projects_base_dir(), name)
+        parent = name.rsplit("_updated_", 1)[0] if "_updated_" in name else None
+        _upsert(conn, project_dir, _read_run_command(project_dir), parent)
+
+
+def list_projects(offset: int = 0, limit: int = 10) -> tuple[list[dict], int]:
+    """Return one page of projects (newest first) and the total number of projects."""
+    with _lock, _connect() as conn:
+        _sync(conn)
+        total = conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0]
+        rows = conn.execute(
+            "SELECT name, type, created, run_command, main_files, parent FROM projects "
+            "ORDER BY created DESC LIMIT ? OFFSET ?",
+            (limit, offset),
+        ).fetchall()
+    return [_row_to_info(row) for row in rows], total
+
+
+def get_project(project_dir: str) -> Optional[dict]:
+    """Indexed information about a project, or None if it is not in the index."""
+    with _lock, _connect() as conn:
+        row = conn.execute(
+            "SELECT name, type, created, run_command, main_files, parent FROM projects WHERE name = ?",
+            (os.path.basename(project_dir),),
+        ).fetchone()
+    return _row_to_info(row) if row else None
+
+
+def project_versions(project_dir: str) -> list[dict]:
+    """Projects updated from this one (its direct child versions), newest first."""
+    with _lock, _connect() as conn:
+        rows = conn.execute(
+            "SELECT name, type, created, run_command, main_files, parent FROM projects WHERE parent = ? ORDER BY created DESC",
+            (os.path.basename(project_dir),),
+        ).fetchall()
+    return [_row_to_info(row) for row in rows]
@@ -0,0 +1,274 @@
+import ast
+import os
+import re
+
+from doc_ranker import BM25
+from models import File
+from token_counter import count_tokens
+
+ALWAYS_INCLUDED = {"requirements.txt"}
+CHUNK_LINES = 40
+
+
+def code_terms(text: str) -> list[str]:
+    """Lowercase terms for code search: whole identifiers plus their snake_case and camelCase parts."""
+    terms = []
+    for identifier in re.findall(r"[A-Za-z_][A-Za-z0-9_]*|\d+", text):
+        lowered = identifier.lower()
+        if len(lowered) > 1:
+            terms.append(lowered)
+        parts = [part.lower() for part in re.findall(r"[A-Z]?[a-z0-9]+|[A-Z]+(?![a-z])", identifier)]
+        if len(parts) > 1:
+            terms.extend(part for part in parts if len(part) > 1)
+    return terms
+
+
+def module_name(path: str) -> str:
+    """Dotted module name of a project-relative .py path (pkg/mod.py -> pkg.mod, pkg/__init__.py -> pkg)."""
+    parts = os.path.splitext(path.replace(os.sep, "/"))[0].split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+class ProjectRetrievalIndex:
+    """Offline index over a project's files: ast symbol table, import graph and BM25 over code chunks."""
+
+    def __init__(self, files: list[File]):
+        self.files = {file.name: file for file in files}
+        self.modules = {module_name(name): name for name in self.files if name.endswith(".py")}
+        self.symbols = {}  # file name -> top-level function/class names
+        self.imports = {}  # file name -> {project file it imports: names it uses from that file}
+        self.chunks = []  # (file name, top-level symbol or None for module-level code, source)
+        for file in files:
+            self._index_file(file)
+        self.bm25 = BM25([f"{name} {symbol or ''}\n{source}" for name, symbol, source in self.chunks], tokenizer=code_terms)
+
+    def _index_file(self, file: File) -> None:
+        tree = None
+        if file.name.endswith(".py"):
+            try:
+                tree = ast.parse(file.content)
+            except SyntaxError:
+                pass
+        if tree is None:
+            lines = file.content.splitlines()
+            for start in range(0, max(len(lines), 1), CHUNK_LINES):
+                self.chunks.append((file.name, None, "\n".join(lines[start:start + CHUNK_LINES])))
+            return
+
+        lines = file.content.splitlines()
+        symbols, module_level = [], []
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                symbols.append(node.name)
+                self.chunks.append((file.name, node.name, "\n".join(lines[_node_start(node):node.end_lineno])))
+            else:
+                module_level.extend(lines[node.lineno - 1:node.end_lineno])
+        if module_level:
+            self.chunks.append((file.name, None, "\n".join(module_level)))
+        self.symbols[file.name] = symbols
+        self.imports[file.name] = self._resolve_imports(file.name, tree)
+
+    def _resolve_imports(self, name: str, tree: ast.Module) -> dict:
+        package = module_name(name).split(".")
+        if not name.endswith("__init__.py"):
+            package = package[:-1]
+        targets = {}
+        bindings = {}  # local (dotted) name -> project module imported under it
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                imported = [(alias.name, alias.asname or alias.name) for alias in node.names]
+            elif isinstance(node, ast.ImportFrom):
+                base = node.module or ""
+                if node.level:
+                    anchor = package[:len(package) - node.level + 1]
+                    base = ".".join(anchor + ([base] if base else []))
+                imported = [(f"{base}.{alias.name}" if base else alias.name, alias.asname or alias.name) for alias in node.names]
+            else:
+                continue
+            for candidate, local in imported:
+                # import a.b.c may refer to the project's a/b/c.py, a/b.py or a.py
+                parts = candidate.split(".")
+                for end in range(len(parts), 0, -1):
+                    target = self.modules.get(".".join(parts[:end]))
+                    if target:
+                        break
+                else:
+                    continue
+                if target == name:
+                    continue
+                used = targets.setdefault(target, set())
+                if end < len(parts):
+                    used.add(parts[end])  # from module import name
+                else:
+                    bindings[local] = target
+        # Names reached through an imported module (module.name) are used from it too
+        for node in ast.walk(tree):
+            dotted = _dotted_name(node) if isinstance(node, ast.Attribute) else None
+            for local, target in bindings.items():
+                if dotted and dotted.startswith(f"{local}."):
+                    targets[target].add(dotted[len(local) + 1:].split(".")[0])
+        return targets
+
+    def file_scores(self, query: str) -> dict:
+        """Relevance of each file to query: its best chunk's BM25 score plus symbol-name matches."""
+        scores = dict.fromkeys(self.files, 0.0)
+        for (name, _, _), score in zip(self.chunks, self.bm25.scores(query)):
+            scores[name] = max(scores[name], score)
+        query_terms = set(code_terms(query))
+        for name, symbols in self.symbols.items():
+            scores[name] += sum(1.0 for symbol in symbols if query_terms & set(code_terms(symbol)))
+        return scores
+
+    def relevant_files(self, query: str, top_k: int = 6, entry_files: tuple = (), token_budget: int = 8000) -> tuple[list[File], set]:
+        """Code most relevant to query, and the project code it uses, within token_budget.
+
+        requirements.txt and the entry points come first, then the top_k
+        best-matching files, then the files they import from. A matching file
+        is sent whole when it is small enough; otherwise (and for imported
+        files, always) only its module-level code and the functions and
+        classes that match the query or are imported are sent. Returns the
+        files and the names of those sent as excerpts.
+        """
+        scores = self.file_scores(query)
+        chunk_scores = self.bm25.scores(query)
+        ranked = [name for name in sorted(scores, key=lambda name: -scores[name]) if scores[name] > 0][:top_k]
+        matching = [name for name in self.files if name in ALWAYS_INCLUDED or name in entry_files]
+        matching += [name for name in ranked if name not in matching]
+        used_names = {}
+        for name in matching:
+            for target, names in self.imports.get(name, {}).items():
+                used_names.setdefault(target, set()).update(names)
+        order = matching + [name for name in sorted(used_names) if name not in matching]
+
+        selected, excerpted, remaining = [], set(), token_budget
+        for name in order:
+            file = self.files[name]
+            size = count_tokens(file.content)
+            whole = name in ALWAYS_INCLUDED or (name in matching and size <= token_budget // 4)
+            content = file.content if whole and size <= remaining else None
+            if content is None and name in self.symbols:
+                content = self._excerpt(name, used_names.get(name, set()), chunk_scores if name in matching else None, remaining)
+                if content is not None and content != file.content:
+                    excerpted.add(name)
+            if content is None:
+                continue
+            selected.append(File(name=name, content=content))
+            remaining -= count_tokens(content)
+        return selected, excerpted
+
+    def _excerpt(self, name: str, used_names: set, chunk_scores: list[float] | None, token_budget: int) -> str | None:
+        """The module-level code and the chunks of a Python file that are used or match, within token_budget."""
+        chunks = [(i, symbol) for i, (file_name, symbol, _) in enumerate(self.chunks) if file_name == name]
+        # Names that are not functions or classes (constants, app objects) live in the module-level code
+        wanted = [i for i, symbol in chunks if symbol is None and (chunk_scores is not None or used_names - set(self.symbols[name]))]
+        wanted += [i for i, symbol in chunks if symbol in used_names]
+        if chunk_scores is not None:
+            wanted += sorted((i for i, _ in chunks if chunk_scores[i] > 0 and i not in wanted), key=lambda i: -chunk_scores[i])
+        picked, size = set(), 0
+        for i in wanted:
+            tokens = count_tokens(self.chunks[i][2])
+            if size + tokens <= token_budget:
+                picked.add(i)
+                size += tokens
+        if not picked:
+            return None
+        if len(picked) == len(chunks) and count_tokens(self.files[name].content) <= token_budget:
+            return self.files[name].content
+        # Module-level code (imports, globals) first, then the definitions in file order
+        ordered = sorted(picked, key=lambda i: (self.chunks[i][1] is not None, i))
+        return "\n\n# ...\n\n".join(self.chunks[i][2] for i in ordered)
+
+
+def _node_start(node: ast.AST) -> int:
+    """0-based first line of a top-level statement, including its decorators."""
+    return min([node.lineno] + [decorator.lineno for decorator in getattr(node, "decorator_list", [])]) - 1
+
+
+def _dotted_name(node: ast.AST) -> str | None:
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+def merge_excerpt(original: str, excerpt: str) -> str:
+    """Merge a file returned for an excerpt back into the file's full source.
+
+    Top-level functions and classes replace those of the same name or are
+    appended; new imports go after the existing ones and other new
+    module-level statements are appended. Raises ValueError when either
+    version is not valid Python.
+    """
+    try:
+        original_tree, excerpt_tree = ast.parse(original), ast.parse(excerpt)
+    except SyntaxError as e:
+        raise ValueError(f"cannot merge excerpt: {e}") from e
+    lines = original.splitlines(keepends=True)
+    excerpt_lines = excerpt.splitlines(keepends=True)
+    definitions = {
+        node.name: (_node_start(node), node.end_lineno) for node in original_tree.body
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+    }
+    existing = {ast.dump(node) for node in original_tree.body}
+    imports_end = max((node.end_lineno for node in original_tree.body if isinstance(node, (ast.Import, ast.ImportFrom))), default=0)
+
+    edits, new_imports, appended = [], [], []
+    for node in excerpt_tree.body:
+        text = "".join(excerpt_lines[_node_start(node):node.end_lineno]).rstrip("\n") + "\n"
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and node.name in definitions:
+            start, end = definitions.pop(node.name)
+            edits.append((start, end, text))
+        elif ast.dump(node) in existing:
+            continue
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            new_imports.append(text)
+        else:
+            appended.append(text)
+    if new_imports:
+        edits.append((imports_end, imports_end, "".join(new_imports)))
+
+    merged, position = [], 0
+    for start, end, text in sorted(edits, key=lambda edit: (edit[0], edit[1])):
+        merged.append("".join(lines[position:start]))
+        merged.append(text)
+        position = end
+    merged.append("".join(lines[position:]))
+    content = "".join(merged)
+    if appended:
+        content = content.rstrip("\n") + "\n\n\n" + "\n\n".join(appended)
+    return content
+
+
+def entry_files_from_command(run_command: str) -> tuple:
+    """Project files a run command starts (app.py in `streamlit run app.py`, main.py in `uvicorn main:app`)."""
+    entries = []
+    for part in run_command.split():
+        if part.endswith(".py"):
+            entries.append(part)
+        elif re.fullmatch(r"[\w.]+:\w+", part):
+            entries.append(part.split(":")[0].replace(".", "/") + ".py")
+    return tuple(entries)
+
+
+def retrieval_token_budget() -> int:
+    """Tokens of project code sent with an update request (RETRIEVAL_TOKEN_BUDGET)."""
+    return int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "8000"))
+
+
+def select_relevant_files(project_files: list[File], query: str, run_command: str = "") -> tuple[list[File], set]:
+    """The code to show the model for a change described by query (RETRIEVAL_TOP_FILES, RETRIEVAL_TOKEN_BUDGET).
+
+    Returns the files, some cut down to excerpts, and the names of the excerpted ones.
+    """
+    top_k = int(os.getenv("RETRIEVAL_TOP_FILES", "6"))
+    token_budget = retrieval_token_budget()
+    if len(project_files) <= top_k and sum(count_tokens(file.content) for file in project_files) <= token_budget:
+        return list(project_files), set()
+    index = ProjectRetrievalIndex(project_files)
+    return index.relevant_files(query, top_k, entry_files_from_command(run_command), token_budget)
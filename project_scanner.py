@@ -0,0 +1,166 @@
+import os
+import re
+
+from models import File
+from token_counter import count_tokens
+
+DEFAULT_EXCLUDES = {
+    ".git", ".hg", ".svn", ".venv", "venv", "env", ".env", "site-packages", "__pycache__", "node_modules",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache", ".tox", ".ipynb_checkpoints", "dist", "build", ".vibe_cache",
+}
+SOURCE_EXTENSIONS = {".py", ".html"}
+SOURCE_NAMES = {"requirements.txt"}
+BINARY_SNIFF_BYTES = 8192
+
+
+def max_file_bytes() -> int:
+    """Largest file read into the prompt (PROJECT_MAX_FILE_KB)."""
+    return int(float(os.getenv("PROJECT_MAX_FILE_KB", "200")) * 1024)
+
+
+def project_token_budget() -> int:
+    """Total tokens of project source sent to the model (PROJECT_TOKEN_BUDGET)."""
+    return int(os.getenv("PROJECT_TOKEN_BUDGET", "60000"))
+
+
+def _glob_to_regex(pattern: str) -> str:
+    regex, i = "", 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+            continue
+        if char == "*":
+            regex += "[^/]*"
+        elif char == "?":
+            regex += "[^/]"
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                regex += re.escape(char)
+            else:
+                regex += "[" + pattern[i + 1:end].replace("!", "^", 1) + "]"
+                i = end
+        else:
+            regex += re.escape(char)
+        i += 1
+    return regex
+
+
+class GitIgnore:
+    """The subset of .gitignore semantics generated projects need: globs, **, !negation, / anchoring and dir-only rules."""
+
+    def __init__(self):
+        self.rules = []
+
+    def add_file(self, path: str, base: str = "") -> None:
+        """Load a .gitignore whose directory is base (relative to the project root, '' for the root)."""
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return
+        for line in lines:
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            if dir_only:
+                line = line.rstrip("/")
+            # A slash anywhere but the end anchors the pattern (/build/ and docs/api alike)
+            anchored = "/" in line
+            line = line.lstrip("/")
+            prefix = f"{re.escape(base)}/" if base else ""
+            if anchored:
+                regex = re.compile(f"^{prefix}{_glob_to_regex(line)}$")
+            else:
+                regex = re.compile(f"^{prefix}(?:.*/)?{_glob_to_regex(line)}$")
+            self.rules.append((regex, negate, dir_only))
+
+    def ignored(self, rel_path: str, is_dir: bool) -> bool:
+        result = False
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                result = not negate
+        return result
+
+
+def _is_source(name: str) -> bool:
+    return name in SOURCE_NAMES or os.path.splitext(name)[1] in SOURCE_EXTENSIONS
+
+
+def _read_text(path: str) -> str | None:
+    """File contents, or None for binary or non-UTF-8 files."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if b"\0" in data[:BINARY_SNIFF_BYTES]:
+        return None
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+def scan_project(project_dir: str, max_bytes: int | None = None, token_budget: int | None = None) -> list[File]:
+    """Read a project's source files in one os.scandir walk, within size and token limits.
+
+    Directories in DEFAULT_EXCLUDES and paths matched by .gitignore files (the
+    root one and nested ones) are never entered. Binary, non-UTF-8 and files
+    larger than max_bytes are skipped. Files are read shallowest first until
+    token_budget is used up, so entry points survive when a project is too big.
+    """
+    max_bytes = max_bytes or max_file_bytes()
+    token_budget = token_budget or project_token_budget()
+    ignore = GitIgnore()
+    candidates = []
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        abs_dir = os.path.join(project_dir, rel_dir)
+        ignore.add_file(os.path.join(abs_dir, ".gitignore"), rel_dir)
+        try:
+            entries = list(os.scandir(abs_dir))
+        except OSError:
+            continue
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name in DEFAULT_EXCLUDES or ignore.ignored(rel_path, True):
+                    continue
+                # A directory with its own interpreter is a virtualenv under another name
+                if os.path.exists(os.path.join(entry.path, "pyvenv.cfg")):
+                    continue
+                stack.append(rel_path)
+            elif entry.is_file(follow_symlinks=False) and _is_source(entry.name) and not ignore.ignored(rel_path, False):
+                size = entry.stat().st_size
+                if size > max_bytes:
+                    print(f"Skipping {rel_path}: {size // 1024} KB exceeds the per-file limit")
+                    continue
+                candidates.append((rel_path.count("/"), rel_path, entry.path))
+
+    files, used = [], 0
+    for _, rel_path, path in sorted(candidates):
+        try:
+            content = _read_text(path)
+        except OSError as e:
+            print(f"Error reading file {path}: {e}")
+            continue
+        if content is None:
+            continue
+        tokens = count_tokens(content)
+        if used + tokens > token_budget:
+            print(f"Skipping {rel_path}: project token budget reached")
+            continue
+        used += tokens
+        files.append(File(name=rel_path, content=content))
+    return files
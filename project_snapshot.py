@@ -0,0 +1,82 @@
+import os
+import shutil
+import threading
+
+SKIP_DIRS = {"__pycache__"}
+# Generated source, only ever changed through write_file; data files (SQLite
+# databases, JSON stores, logs, uploads) may be written in place by the app
+SOURCE_EXTENSIONS = {
+    ".py", ".pyi", ".html", ".htm", ".css", ".js", ".mjs", ".ts", ".jsx", ".tsx", ".vue", ".svelte", ".md",
+    ".rst", ".toml", ".cfg", ".ini",
+}
+
+
+def hardlink_snapshots_enabled() -> bool:
+    """Return True unless full copies are requested via USE_HARDLINK_SNAPSHOTS."""
+    return os.getenv("USE_HARDLINK_SNAPSHOTS", "true").lower() not in ("0", "false", "no")
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def snapshot_project(source_dir: str, target_dir: str) -> None:
+    """Create target_dir as a new version of source_dir without copying source file contents.
+
+    Source files are hardlinked into the new version (falling back to a copy
+    across filesystems), so they cost one directory entry each. Any other file
+    is copied, since the app may write to it in place and change both versions.
+    Bytecode caches are skipped. Files must then be changed with write_file,
+    which replaces them instead of writing through the shared inode.
+    """
+    link = _link_or_copy if hardlink_snapshots_enabled() else shutil.copy2
+    os.makedirs(target_dir)
+    stack = [(source_dir, target_dir)]
+    while stack:
+        source, target = stack.pop()
+        with os.scandir(source) as entries:
+            for entry in entries:
+                destination = os.path.join(target, entry.name)
+                if entry.is_symlink():
+                    os.symlink(os.readlink(entry.path), destination)
+                elif entry.is_dir():
+                    if entry.name in SKIP_DIRS:
+                        continue
+                    os.mkdir(destination)
+                    stack.append((entry.path, destination))
+                elif os.path.splitext(entry.name)[1].lower() in SOURCE_EXTENSIONS:
+                    link(entry.path, destination)
+                else:
+                    shutil.copy2(entry.path, destination)
+
+
+def write_file(path: str, content: str) -> bool:
+    """Write text to path by replacing the file rather than editing it in place.
+
+    A snapshot shares its files with the version it was taken from, so writing
+    through an existing hardlink would change both. Unchanged content is left
+    alone (and stays shared). Returns True if the file was written.
+    """
+    try:
+        with open(path, "r") as f:
+            if f.read() == content:
+                return False
+    except (OSError, UnicodeDecodeError):
+        pass
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return True
@@ -0,0 +1,140 @@
+import os
+import signal
+import socket
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlparse
+
+TRACEBACK_MARKER = "Traceback (most recent call last)"
+
+
+class OutputTail:
+    """Drain a process's stdout/stderr in background threads and remember the output.
+
+    Draining keeps the pipes from filling up and blocking the app; the collected
+    text is used to report errors and to spot tracebacks while the app is still running.
+    """
+
+    def __init__(self, process: subprocess.Popen):
+        self.lines = []
+        self.traceback_at = None
+        self._lock = threading.Lock()
+        self._threads = []
+        for stream in (process.stdout, process.stderr):
+            if stream is None:
+                continue
+            thread = threading.Thread(target=self._drain, args=(stream,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _drain(self, stream) -> None:
+        for line in iter(stream.readline, ""):
+            with self._lock:
+                self.lines.append(line)
+                if self.traceback_at is None and TRACEBACK_MARKER in line:
+                    self.traceback_at = time.monotonic()
+
+    def join(self, timeout: float = 1.0) -> None:
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def text(self) -> str:
+        with self._lock:
+            return "".join(self.lines)
+
+
+def health_url(app_url: str, run_command: str | None = None) -> str:
+    """Endpoint to poll for an application URL (Streamlit exposes a dedicated health check).
+
+    The run command tells a Streamlit app apart on any port; without it the
+    default Streamlit port is taken as the hint.
+    """
+    parsed = urlparse(app_url)
+    streamlit = "streamlit" in run_command.lower() if run_command else parsed.port == 8501
+    if streamlit:
+        return f"{parsed.scheme}://{parsed.netloc}/_stcore/health"
+    return app_url
+
+
+def _port_open(host: str, port: int) -> bool:
+    try:
+        with socket.create_connection((host, port), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+
+def _http_ok(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(url, timeout=2) as response:
+            return response.status < 500
+    except urllib.error.HTTPError as e:
+        # Any non-5xx answer (e.g. 404 when /docs is disabled) means the server is up
+        return e.code < 500
+    except (urllib.error.URLError, OSError):
+        return False
+
+
+def wait_until_ready(process: subprocess.Popen, app_url: str, run_command: str | None = None, deadline: float | None = None) -> tuple[bool, str | None]:
+    """Poll the app's port and URL with backoff until it answers, crashes or the deadline passes.
+
+    Returns (ready, error). On failure the process is terminated and error holds
+    the captured output (or a timeout message).
+    """
+    if deadline is None:
+        deadline = float(os.getenv("READINESS_TIMEOUT", "30"))
+    parsed = urlparse(app_url)
+    host, port = parsed.hostname or "localhost", parsed.port or 80
+    url = health_url(app_url, run_command)
+    tail = OutputTail(process)
+    start = time.monotonic()
+    delay = 0.05
+
+    while True:
+        if process.poll() is not None:
+            # Workers the app started may outlive it
+            _terminate(process)
+            tail.join()
+            return False, tail.text() or f"Process exited with code {process.returncode}"
+        if tail.traceback_at is not None and time.monotonic() - tail.traceback_at > 0.2:
+            _terminate(process)
+            tail.join()
+            return False, tail.text()
+        if _port_open(host, port) and _http_ok(url):
+            return True, None
+        if time.monotonic() - start > deadline:
+            _terminate(process)
+            tail.join()
+            output = tail.text()
+            return False, f"Application did not answer on {app_url} within {deadline:.0f}s\n{output}".strip()
+        time.sleep(delay)
+        delay = min(delay * 1.5, 1.0)
+
+
+def _terminate(process: subprocess.Popen) -> None:
+    """Stop an app started in its own session (setsid) together with every process in it."""
+    if os.name == "nt":
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+        # Whatever is left of the group (a stuck parent or its workers) is killed
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    try:
+        process.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        pass
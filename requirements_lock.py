@@ -0,0 +1,98 @@
+import json
+import os
+import re
+import threading
+from importlib import metadata
+
+from project_snapshot import write_file
+from response_cache import get_cache_dir
+from venv_manager import requirements_hash, site_packages_dir
+
+LOCK_FILE = "requirements.lock.json"
+SYSTEM_ENVIRONMENT = "system"
+
+_lock = threading.Lock()
+
+
+def _canonical(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def requirement_names(requirements: list[str]) -> list[str]:
+    """Distribution names referenced by normalized requirement lines."""
+    names = []
+    for line in requirements:
+        if line.startswith("-"):
+            continue
+        name = re.split(r"[<>=!~;\[\s@]", line, 1)[0]
+        if name:
+            names.append(_canonical(name))
+    return names
+
+
+def resolved_versions(requirements: list[str], venv_dir: str | None = None) -> dict | None:
+    """Installed version of every required distribution, or None if one is missing."""
+    if venv_dir:
+        site_packages = site_packages_dir(venv_dir)
+        if not site_packages:
+            return None
+        installed = {}
+        for entry in os.listdir(site_packages):
+            if entry.endswith(".dist-info"):
+                name, _, version = entry[: -len(".dist-info")].partition("-")
+                installed[_canonical(name)] = version
+    else:
+        installed = {_canonical(dist.metadata["Name"] or ""): dist.version for dist in metadata.distributions()}
+    versions = {}
+    for name in requirement_names(requirements):
+        if name not in installed:
+            return None
+        versions[name] = installed[name]
+    return versions
+
+
+def _installed_path() -> str:
+    return os.path.join(get_cache_dir(), "installed_requirements.json")
+
+
+def _read_json(path: str) -> dict:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def install_is_current(project_dir: str, requirements: list[str], venv_dir: str | None = None) -> bool:
+    """Return True when these requirements were already installed into the environment and still are.
+
+    The project's own lock file is checked first, then the per-environment record
+    shared by all projects, so regenerated attempts with the same requirements skip pip too.
+    """
+    environment = venv_dir or SYSTEM_ENVIRONMENT
+    fingerprint = requirements_hash(requirements)
+    lock = _read_json(os.path.join(project_dir, LOCK_FILE))
+    if lock.get("fingerprint") == fingerprint and lock.get("environment") == environment:
+        recorded = lock.get("packages")
+    else:
+        with _lock:
+            recorded = _read_json(_installed_path()).get(environment, {}).get(fingerprint)
+    if recorded is None:
+        return False
+    return resolved_versions(requirements, venv_dir) == recorded
+
+
+def record_install(project_dir: str, requirements: list[str], venv_dir: str | None = None) -> None:
+    """Write the project's lock file and remember the install for the environment."""
+    environment = venv_dir or SYSTEM_ENVIRONMENT
+    fingerprint = requirements_hash(requirements)
+    packages = resolved_versions(requirements, venv_dir)
+    if packages is None:
+        return
+    lock = {"fingerprint": fingerprint, "environment": environment, "packages": packages}
+    write_file(os.path.join(project_dir, LOCK_FILE), json.dumps(lock, indent=2))
+    with _lock:
+        installed = _read_json(_installed_path())
+        installed.setdefault(environment, {})[fingerprint] = packages
+        with open(_installed_path(), "w") as f:
+            json.dump(installed, f, indent=2)
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+_lock = threading.Lock()
+
+
+def get_cache_dir() -> str:
+    """Directory for on-disk caches (RESPONSE_CACHE_DIR, default .vibe_cache/)."""
+    cache_dir = os.getenv("RESPONSE_CACHE_DIR", os.path.join(os.getcwd(), ".vibe_cache"))
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def _cache_path() -> str:
+    """Location of the SQLite file holding cached LLM responses."""
+    return os.path.join(get_cache_dir(), "responses.sqlite3")
+
+
+def cache_enabled() -> bool:
+    """Return False when the cache is bypassed via DISABLE_RESPONSE_CACHE."""
+    return os.getenv("DISABLE_RESPONSE_CACHE", "").lower() not in ("1", "true", "yes")
+
+
+@contextmanager
+def _connect():
+    """Open the cache database, commit on success and always close it."""
+    conn = sqlite3.connect(_cache_path(), timeout=30)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS responses ("
+        "key TEXT PRIMARY KEY, "
+        "schema_name TEXT, "
+        "payload TEXT NOT NULL, "
+        "size INTEGER NOT NULL, "
+        "created_at REAL NOT NULL, "
+        "last_used REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def make_cache_key(model_name: str, messages: list, base_model: type) -> str:
+    """Hash the model name, the serialized messages and the response schema."""
+    material = json.dumps(
+        {
+            "model": model_name,
+            "messages": messages,
+            "schema": base_model.model_json_schema(),
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def get_cached_response(key: str) -> Optional[str]:
+    """Return the cached JSON payload for a key, or None on a miss or expiry."""
+    max_age = float(os.getenv("RESPONSE_CACHE_MAX_AGE_DAYS", "30")) * 86400
+    now = time.time()
+    with _lock, _connect() as conn:
+        row = conn.execute("SELECT payload, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        payload, created_at = row
+        if now - created_at > max_age:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        return payload
+
+
+def store_response(key: str, schema_name: str, payload: str) -> None:
+    """Save a JSON payload under a key and evict old or least recently used entries."""
+    now = time.time()
+    with _lock, _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, schema_name, payload, size, created_at, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, schema_name, payload, len(payload.encode("utf-8")), now, now),
+        )
+        _evict(conn, now)
+
+
+def delete_response(key: str) -> None:
+    """Forget one cached response, e.g. a generated project that turned out not to work."""
+    with _lock, _connect() as conn:
+        conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+
+def _evict(conn: sqlite3.Connection, now: float) -> None:
+    """Drop expired entries, then the least recently used ones until under the size limit."""
+    max_age = float(os.getenv("RESPONSE_CACHE_MAX_AGE_DAYS", "30")) * 86400
+    max_bytes = int(float(os.getenv("RESPONSE_CACHE_MAX_MB", "200")) * 1024 * 1024)
+    conn.execute("DELETE FROM responses WHERE created_at < ?", (now - max_age,))
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= max_bytes:
+        return
+    for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used ASC").fetchall():
+        conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        total -= size
+        if total <= max_bytes:
+            break
+
+
+def clear_cache() -> None:
+    """Remove every cached response."""
+    with _lock, _connect() as conn:
+        conn.execute("DELETE FROM responses")
@@ -1,9 +1,22 @@
 import sys
 import os
 import re
+import atexit
+import hashlib
+import mimetypes
+import shutil
+import tempfile
+import threading
 import requests
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from html.parser import HTMLParser
 from urllib.parse import urljoin, urlparse
+from doc_cache import (
+    docs_cache_enabled, conditional_headers, get_cached_page, store_page, touch_page, restore_images,
+    get_cached_image, store_image, touch_image,
+)
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import WebDriverException, TimeoutException
@@ -11,54 +24,534 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+# JavaScript that captures the rendered DOM (tags, direct text, visibility and the
+# attributes we use) in a single WebDriver round trip
+SNAPSHOT_SCRIPT = """
+const SKIP = new Set(['script', 'style', 'noscript']);
+function isVisible(el) {
+    const style = window.getComputedStyle(el);
+    if (style.display === 'none' || style.visibility === 'hidden' || style.opacity === '0') {
+        return false;
+    }
+    // display: contents wrappers have no box of their own but their children render;
+    // walk() still checks each child
+    if (style.display === 'contents') {
+        return true;
+    }
+    return el.getClientRects().length > 0 || el.tagName.toLowerCase() === 'body';
+}
+function directText(el) {
+    return Array.from(el.childNodes)
+        .filter(node => node.nodeType === Node.TEXT_NODE)
+        .map(node => node.textContent.trim())
+        .join(' ')
+        .replace(/\\s+/g, ' ')
+        .trim();
+}
+function walk(el) {
+    const tag = el.tagName.toLowerCase();
+    if (SKIP.has(tag) || !isVisible(el)) {
+        return null;
+    }
+    const node = {
+        tag: tag,
+        text: directText(el),
+        href: el.getAttribute('href') === null ? null : (el.href || el.getAttribute('href')),
+        src: el.getAttribute('src') === null ? null : (el.src || el.getAttribute('src')),
+        alt: el.getAttribute('alt'),
+        children: []
+    };
+    for (const child of el.children) {
+        const childNode = walk(child);
+        if (childNode) {
+            node.children.push(childNode);
+        }
+    }
+    return node;
+}
+return document.body ? walk(document.body) : null;
+"""
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+SKIP_TAGS = {"script", "style", "noscript", "template", "head", "svg"}
+# Mount points of single-page-app frameworks that render everything client side
+APP_ROOT_PATTERN = re.compile(r'<div[^>]+id=["\'](root|app|__next|__nuxt|svelte)["\'][^>]*>\s*</div>|ng-app|data-reactroot', re.IGNORECASE)
+NOSCRIPT_HINT_PATTERN = re.compile(r"<noscript[^>]*>[^<]*(enable|requires?|need)[^<]*javascript", re.IGNORECASE)
+MIN_STATIC_TEXT = 200
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg", ".bmp", ".ico", ".avif"}
+IMAGE_CHUNK_SIZE = 64 * 1024
+
+class SnapshotParser(HTMLParser):
+    """Build the same node tree as SNAPSHOT_SCRIPT from raw HTML, without a browser"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.body = None
+        self.stack = []
+        # Tag that opened the subtree being skipped, and how many of it are open;
+        # other tags inside are ignored since HTML often leaves them unclosed
+        self.skip_tag = None
+        self.skip_depth = 0
+        self.in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "title":
+            self.in_title = True
+        if self.skip_depth:
+            if tag == self.skip_tag:
+                self.skip_depth += 1
+            return
+        if tag in SKIP_TAGS or self._hidden(attrs):
+            if tag not in VOID_TAGS:
+                self.skip_tag, self.skip_depth = tag, 1
+            return
+        node = {"tag": tag, "text": "", "href": attrs.get("href"), "src": attrs.get("src"), "alt": attrs.get("alt"), "children": []}
+        if tag == "body":
+            self.body = node
+            self.stack = [node]
+            return
+        if self.stack:
+            self.stack[-1]["children"].append(node)
+        if tag not in VOID_TAGS and self.stack:
+            self.stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        # A self-closing tag opens no subtree, so it must not touch skip_depth
+        if self.skip_depth or tag in SKIP_TAGS or self._hidden(dict(attrs)):
+            return
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.stack and self.stack[-1]["tag"] == tag:
+            self.stack.pop()
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self.in_title = False
+        if self.skip_depth:
+            if tag == self.skip_tag:
+                self.skip_depth -= 1
+            return
+        # Pop up to the matching open tag, tolerating unclosed children
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i]["tag"] == tag:
+                del self.stack[i:]
+                break
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title += data.strip()
+            return
+        if self.skip_depth or not self.stack:
+            return
+        text = " ".join(data.split())
+        if text:
+            node = self.stack[-1]
+            node["text"] = f"{node['text']} {text}".strip()
+
+    @staticmethod
+    def _hidden(attrs):
+        if "hidden" in attrs:
+            return True
+        style = (attrs.get("style") or "").replace(" ", "").lower()
+        return "display:none" in style or "visibility:hidden" in style
+
+NOT_MODIFIED = object()
+
+def fetch_static(url, timeout=10, cached=None):
+    """Fetch a page with a plain HTTP GET.
+
+    Returns (html, final_url, headers), NOT_MODIFIED when the validators of a
+    cached copy show the page is unchanged, or None if the fetch failed or the
+    page is not HTML.
+    """
+    headers = {"User-Agent": "Mozilla/5.0 (vibe_coder docs fetcher)", **conditional_headers(cached)}
+    try:
+        response = requests.get(url, timeout=timeout, headers=headers)
+        if response.status_code == 304 and cached:
+            return NOT_MODIFIED
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"Plain fetch failed: {e}")
+        return None
+    if "html" not in response.headers.get("Content-Type", "html"):
+        return None
+    return response.text, response.url, response.headers
+
+class ImageDownloader:
+    """Download a page's images in the background while its markdown is being built.
+
+    add() queues an image and returns a placeholder to put in the markdown;
+    resolve() waits for the downloads and swaps each placeholder for the local
+    path (or the original URL when the download failed). Files are named by a
+    hash of their content, so identical images are stored once and different
+    images with the same basename no longer overwrite each other.
+    """
+
+    def __init__(self, img_dir):
+        self.img_dir = img_dir
+        self.downloads = {}
+        os.makedirs(img_dir, exist_ok=True)
+
+    def add(self, img_url):
+        if img_url not in self.downloads:
+            placeholder = f"vibe-image-{len(self.downloads)}-pending"
+            self.downloads[img_url] = (placeholder, _image_executor().submit(save_image, img_url, self.img_dir))
+        return self.downloads[img_url][0]
+
+    def resolve(self, markdown):
+        for img_url, (placeholder, future) in self.downloads.items():
+            try:
+                target = f"images/{future.result()}"
+            except Exception as e:
+                print(f"Failed to download image {img_url}: {e}")
+                target = img_url
+            markdown = markdown.replace(placeholder, target)
+        return markdown
+
+_image_pool = None
+_image_pool_lock = threading.Lock()
+
+def _image_executor():
+    """Shared worker pool (SCRAPER_IMAGE_WORKERS threads) for image downloads"""
+    global _image_pool
+    with _image_pool_lock:
+        if _image_pool is None:
+            _image_pool = ThreadPoolExecutor(max_workers=int(os.getenv("SCRAPER_IMAGE_WORKERS", "8")))
+        return _image_pool
+
+_session_local = threading.local()
+
+def _image_session():
+    """Per-thread requests.Session so image downloads reuse keep-alive connections"""
+    session = getattr(_session_local, "session", None)
+    if session is None:
+        session = _session_local.session = requests.Session()
+        session.headers["User-Agent"] = "Mozilla/5.0 (vibe_coder docs fetcher)"
+    return session
+
+def _image_extension(img_url, content_type=None):
+    ext = os.path.splitext(urlparse(img_url).path)[1].lower()
+    if ext in IMAGE_EXTENSIONS:
+        return ext
+    return mimetypes.guess_extension((content_type or "").split(";")[0].strip()) or ".img"
+
+def save_image(img_url, img_dir, timeout=5):
+    """Download img_url into img_dir under a content-hash name and return that name.
+
+    The body is streamed to disk in chunks. A copy in the docs cache is reused
+    while fresh and revalidated with a conditional request once it is stale.
+    """
+    use_cache = docs_cache_enabled()
+    cached = get_cached_image(img_url) if use_cache else None
+    if cached and cached["fresh"]:
+        return _place_image(cached["path"], cached["digest"], _image_extension(img_url), img_dir, copy=True)
+
+    try:
+        with _image_session().get(img_url, timeout=timeout, stream=True, headers=conditional_headers(cached)) as response:
+            if response.status_code == 304 and cached:
+                touch_image(img_url)
+                return _place_image(cached["path"], cached["digest"], _image_extension(img_url), img_dir, copy=True)
+            response.raise_for_status()
+            digest = hashlib.sha256()
+            fd, tmp_path = tempfile.mkstemp(dir=img_dir, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    for chunk in response.iter_content(IMAGE_CHUNK_SIZE):
+                        f.write(chunk)
+                        digest.update(chunk)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+            headers = response.headers
+    except requests.RequestException:
+        if cached:
+            return _place_image(cached["path"], cached["digest"], _image_extension(img_url), img_dir, copy=True)
+        raise
+
+    digest = digest.hexdigest()
+    if use_cache:
+        store_image(img_url, tmp_path, digest, headers)
+    return _place_image(tmp_path, digest, _image_extension(img_url, headers.get("Content-Type")), img_dir)
+
+def _place_image(path, digest, ext, img_dir, copy=False):
+    """Put an image file into img_dir as <hash><ext>, skipping it if that content is already there"""
+    name = f"{digest[:16]}{ext}"
+    target = os.path.join(img_dir, name)
+    if os.path.exists(target):
+        if not copy:
+            os.remove(path)
+    elif copy:
+        shutil.copyfile(path, target)
+    else:
+        os.replace(path, target)
+    return name
+
+def visible_text_length(node):
+    """Total length of the direct text in a node tree"""
+    return len(node.get("text") or "") + sum(visible_text_length(child) for child in node.get("children") or [])
+
+def looks_js_rendered(html, tree):
+    """Heuristic: does this page need a browser to show its content?"""
+    if tree is None or visible_text_length(tree) < MIN_STATIC_TEXT:
+        return True
+    if NOSCRIPT_HINT_PATTERN.search(html):
+        return True
+    # An empty framework mount point with little text around it
+    return bool(APP_ROOT_PATTERN.search(html)) and visible_text_length(tree) < MIN_STATIC_TEXT * 10
+
+def tree_to_markdown(title, tree, url, output_dir=None, image_download=False):
+    """Convert a snapshot tree to a markdown document"""
+    images = ImageDownloader(os.path.join(output_dir, "images")) if image_download and output_dir else None
+    markdown_content = [f"# {title}\n\n"]
+    process_node(tree, markdown_content, url, images)
+    markdown = "\n".join(markdown_content)
+    return images.resolve(markdown) if images else markdown
+
 # Function to scrape a website and convert it to markdown
-def scrape_website(url, output_dir=None, image_download=False, wait_time=5):
-    # Set up headless Chrome
+def scrape_website(url, output_dir=None, image_download=False, wait_time=5, extraction_mode="snapshot", use_browser="auto", pool=None, use_cache=True):
+    """Scrape url and convert it to markdown, using a browser only when needed.
+
+    With use_browser="auto" the page is first fetched with a plain HTTP GET and
+    converted in-process; headless Chrome is only started when the result looks
+    JavaScript-rendered (little text, an empty framework root div or a noscript
+    hint). use_browser=True always renders, False never does.
+
+    Results are kept in the on-disk docs cache: within DOCS_CACHE_TTL_HOURS a
+    page is returned without touching the network, after that it is revalidated
+    with ETag/Last-Modified and only scraped again when it changed.
+    """
+    variant = "images" if image_download and output_dir else "text"
+    cached = get_cached_page(url, variant) if use_cache and docs_cache_enabled() else None
+    if cached and cached["fresh"]:
+        print(f"Using cached docs: {url}")
+        return restore_cached_page(cached, output_dir)
+
+    fetched = None
+    if use_browser is not True or cached:
+        fetched = fetch_static(url, cached=cached)
+        if fetched is NOT_MODIFIED:
+            touch_page(url, variant)
+            print(f"Cached docs are still current: {url}")
+            return restore_cached_page(cached, output_dir)
+        if fetched is None and cached:
+            print(f"Could not revalidate {url}, using cached docs")
+            return restore_cached_page(cached, output_dir)
+
+    markdown = None
+    if fetched and use_browser is not True:
+        html, final_url, _ = fetched
+        parser = SnapshotParser()
+        parser.feed(html)
+        parser.close()
+        if use_browser is False or not looks_js_rendered(html, parser.body):
+            print(f"Fetched static page: {url}")
+            markdown = tree_to_markdown(parser.title, parser.body or {"tag": "body", "children": []}, final_url, output_dir, image_download)
+        else:
+            print("Page looks JavaScript-rendered, starting browser...")
+    if markdown is None and (fetched or use_browser is not False):
+        markdown = scrape_with_browser(url, output_dir, image_download, wait_time, extraction_mode, pool)
+
+    if markdown and use_cache and docs_cache_enabled():
+        store_page(url, variant, markdown, fetched[2] if fetched else None, local_images(markdown, output_dir) if variant == "images" else None)
+    return markdown
+
+def restore_cached_page(cached, output_dir=None):
+    """Markdown of a cached page, copying its images into output_dir first"""
+    if cached["images"] and output_dir:
+        restore_images(cached["images"], os.path.join(output_dir, "images"))
+    return cached["markdown"]
+
+def local_images(markdown, output_dir):
+    """Bytes of the downloaded images a page's markdown refers to, keyed by file name"""
+    images = {}
+    for name in set(re.findall(r"\]\(images/([^)\s]+)\)", markdown)):
+        try:
+            with open(os.path.join(output_dir, "images", name), "rb") as f:
+                images[name] = f.read()
+        except OSError:
+            pass
+    return images
+
+def chrome_options():
+    """Options for a headless Chrome instance"""
     options = Options()
     options.add_argument('--headless')
     options.add_argument('--disable-gpu')
     options.add_argument('--no-sandbox')
     options.add_argument('--window-size=1920,1080')
-    
+    return options
+
+class BrowserPool:
+    """A bounded pool of warm headless Chrome instances shared by concurrent scrapes.
+
+    Browsers are started lazily, so a pool that only ever serves static pages
+    never launches Chrome.
+    """
+
+    def __init__(self, size=2):
+        self.size = size
+        self._idle = []
+        self._created = 0
+        # Notified whenever a browser is released or a slot frees up
+        self._available = threading.Condition()
+
+    def acquire(self):
+        with self._available:
+            while not self._idle and self._created >= self.size:
+                self._available.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        try:
+            return webdriver.Chrome(options=chrome_options())
+        except Exception:
+            with self._available:
+                self._created -= 1
+                self._available.notify()
+            raise
+
+    def release(self, driver):
+        with self._available:
+            self._idle.append(driver)
+            self._available.notify()
+
+    def discard(self, driver):
+        """Quit a browser that errored instead of returning it to the pool"""
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        with self._available:
+            self._created -= 1
+            self._available.notify()
+
+    @contextmanager
+    def driver(self):
+        driver = self.acquire()
+        broken = False
+        try:
+            yield driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            if broken:
+                self.discard(driver)
+            else:
+                self.release(driver)
+
+    def close(self):
+        with self._available:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self.discard(driver)
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+def get_browser_pool():
+    """Process-wide browser pool (SCRAPER_BROWSER_POOL browsers) for long-lived callers"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = BrowserPool(int(os.getenv("SCRAPER_BROWSER_POOL", "2")))
+            atexit.register(_shared_pool.close)
+        return _shared_pool
+
+def scrape_with_browser(url, output_dir=None, image_download=False, wait_time=5, extraction_mode="snapshot", pool=None):
+    """Render url in headless Chrome and convert it to markdown.
+
+    extraction_mode="snapshot" pulls the whole rendered DOM in one execute_script
+    call and converts it in-process; "element" walks the page node by node over
+    WebDriver (slow on large pages, kept as a fallback). With a pool, a warm
+    browser is borrowed instead of starting a new one.
+    """
     try:
-        with webdriver.Chrome(options=options) as driver:
-            print(f"Loading page: {url}")
-            driver.get(url)
-            
-            # Wait for the page to load completely
-            try:
-                WebDriverWait(driver, wait_time).until(
-                    EC.presence_of_element_located((By.TAG_NAME, "body"))
-                )
-                # Extra time for JavaScript to render
-                time.sleep(2)
-            except TimeoutException:
-                print("Page took too long to load, proceeding anyway")
-            
-            # Create output directory for images if needed
-            if image_download and output_dir:
-                img_dir = os.path.join(output_dir, "images")
-                os.makedirs(img_dir, exist_ok=True)
-            
-            markdown_content = []
-            
-            # Get page title
-            title = driver.title
-            markdown_content.append(f"# {title}\n\n")
-            
-            # Extract main content
-            main_content = driver.find_element(By.TAG_NAME, "body")
-            
-            # Process all elements in order
-            process_element(main_content, markdown_content, driver, url, output_dir, image_download)
-            
-            return "\n".join(markdown_content)
-    
+        if pool is not None:
+            with pool.driver() as driver:
+                return render_page(driver, url, output_dir, image_download, wait_time, extraction_mode)
+        with webdriver.Chrome(options=chrome_options()) as driver:
+            return render_page(driver, url, output_dir, image_download, wait_time, extraction_mode)
     except WebDriverException as e:
         print(f"Failed to open browser: {e}")
         return None
 
-def process_element(element, markdown_list, driver, base_url, output_dir=None, image_download=False, depth=0):
+def render_page(driver, url, output_dir=None, image_download=False, wait_time=5, extraction_mode="snapshot"):
+    """Load url in an open browser and convert the rendered page to markdown"""
+    print(f"Loading page: {url}")
+    driver.get(url)
+    
+    # Wait for the page to load completely
+    try:
+        WebDriverWait(driver, wait_time).until(
+            EC.presence_of_element_located((By.TAG_NAME, "body"))
+        )
+        # Extra time for JavaScript to render
+        time.sleep(2)
+    except TimeoutException:
+        print("Page took too long to load, proceeding anyway")
+    
+    # Images download in the background while the page is converted
+    images = ImageDownloader(os.path.join(output_dir, "images")) if image_download and output_dir else None
+    
+    markdown_content = []
+    
+    # Get page title
+    title = driver.title
+    markdown_content.append(f"# {title}\n\n")
+    
+    tree = None
+    if extraction_mode == "snapshot":
+        try:
+            tree = driver.execute_script(SNAPSHOT_SCRIPT)
+        except WebDriverException as e:
+            print(f"DOM snapshot failed, falling back to element walk: {e}")
+
+    if tree:
+        process_node(tree, markdown_content, url, images)
+    else:
+        # Extract main content
+        main_content = driver.find_element(By.TAG_NAME, "body")
+
+        # Process all elements in order
+        process_element(main_content, markdown_content, driver, url, images)
+
+    markdown = "\n".join(markdown_content)
+    return images.resolve(markdown) if images else markdown
+
+def scrape_many(urls, output_dir=None, image_download=False, max_workers=None, pool=None):
+    """Scrape several URLs concurrently. Returns {url: markdown or None} in input order.
+
+    At most max_workers pages (SCRAPER_MAX_WORKERS, default 4) are processed at
+    once; pages that need a browser share the given pool, or a temporary one.
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    max_workers = max_workers or int(os.getenv("SCRAPER_MAX_WORKERS", "4"))
+    own_pool = pool is None
+    if own_pool:
+        pool = BrowserPool(min(len(urls), int(os.getenv("SCRAPER_BROWSER_POOL", "2"))))
+    try:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+            futures = {
+                url: executor.submit(scrape_website, url, output_dir, image_download, pool=pool)
+                for url in urls
+            }
+            results = {}
+            for url, future in futures.items():
+                try:
+                    results[url] = future.result()
+                except Exception as e:
+                    print(f"Failed to scrape {url}: {e}")
+                    results[url] = None
+            return results
+    finally:
+        if own_pool:
+            pool.close()
+
+def process_element(element, markdown_list, driver, base_url, images=None, depth=0):
     """Process an element and its children, adding markdown to the list"""
     # Skip script, style, and hidden elements
     if element.tag_name in ["script", "style", "noscript"]:
@@ -74,9 +567,21 @@ def process_element(element, markdown_list, driver, base_url, output_dir=None, i
     # Get text content of this element (excluding children)
     element_text = get_direct_text(element, driver).strip()
     
-    # Process by tag name
-    tag = element.tag_name
+    append_markdown(element.tag_name, element_text, element.get_attribute, markdown_list, base_url, images, depth)
     
+    # Process all children
+    try:
+        children = element.find_elements(By.XPATH, "./*")
+        for child in children:
+            process_element(child, markdown_list, driver, base_url, images, depth + 1)
+    except:
+        pass
+
+def append_markdown(tag, element_text, get_attribute, markdown_list, base_url, images=None, depth=0):
+    """Append the markdown for a single element (not its children) to the list.
+
+    images is an ImageDownloader when images should be saved next to the markdown.
+    """
     # Headings
     if tag in ["h1", "h2", "h3", "h4", "h5", "h6"]:
         level = int(tag[1])
@@ -100,7 +605,7 @@ def process_element(element, markdown_list, driver, base_url, output_dir=None, i
     
     # Links
     elif tag == "a":
-        href = element.get_attribute("href")
+        href = get_attribute("href")
         if href and element_text:
             # Create proper absolute URL
             abs_url = urljoin(base_url, href)
@@ -108,29 +613,16 @@ def process_element(element, markdown_list, driver, base_url, output_dir=None, i
     
     # Images
     elif tag == "img":
-        src = element.get_attribute("src")
-        alt = element.get_attribute("alt") or "image"
+        src = get_attribute("src")
+        alt = get_attribute("alt") or "image"
         
         if src:
             # Create proper absolute URL for the image
             img_url = urljoin(base_url, src)
             
-            # Download image if requested
-            if image_download and output_dir:
-                try:
-                    img_filename = os.path.basename(urlparse(img_url).path) or f"image_{hash(img_url)}.jpg"
-                    img_path = os.path.join(output_dir, "images", img_filename)
-                    
-                    # Download the image
-                    img_data = requests.get(img_url, timeout=5).content
-                    with open(img_path, 'wb') as img_file:
-                        img_file.write(img_data)
-                    
-                    # Use local reference in markdown
-                    markdown_list.append(f"![{alt}](images/{img_filename})\n\n")
-                except Exception as e:
-                    print(f"Failed to download image {img_url}: {e}")
-                    markdown_list.append(f"![{alt}]({img_url})\n\n")
+            # Queue the download if requested; the placeholder becomes the local path later
+            if images is not None:
+                markdown_list.append(f"![{alt}]({images.add(img_url)})\n\n")
             else:
                 # Just link to the image
                 markdown_list.append(f"![{alt}]({img_url})\n\n")
@@ -162,14 +654,13 @@ def process_element(element, markdown_list, driver, base_url, output_dir=None, i
         if element_text:
             quoted_text = element_text.replace("\n", "\n> ")
             markdown_list.append(f"> {quoted_text}\n\n")
-    
-    # Process all children
-    try:
-        children = element.find_elements(By.XPATH, "./*")
-        for child in children:
-            process_element(child, markdown_list, driver, base_url, output_dir, image_download, depth + 1)
-    except:
-        pass
+
+def process_node(node, markdown_list, base_url, images=None, depth=0):
+    """Process a DOM snapshot node and its children, adding markdown to the list"""
+    # Hidden, script and style elements were already dropped by SNAPSHOT_SCRIPT
+    append_markdown(node["tag"], (node.get("text") or "").strip(), node.get, markdown_list, base_url, images, depth)
+    for child in node.get("children") or []:
+        process_node(child, markdown_list, base_url, images, depth + 1)
 
 def get_direct_text(element, driver):
     """Get text directly from this element, excluding child elements"""
@@ -0,0 +1,231 @@
+import json
+import os
+import re
+import threading
+from typing import Optional
+
+from openai import APIError, BadRequestError, UnprocessableEntityError
+from pydantic import BaseModel, ValidationError
+
+from response_cache import get_cache_dir
+
+# Structured-output modes, from most to least capable
+MODES = ("parse", "json_schema", "json_object", "prompt")
+
+# Hosted providers known to support response_format=<pydantic model>
+NATIVE_PARSE_HOSTS = ("api.openai.com",)
+
+# Words a provider's error uses when it rejects the structured-output format itself
+MODE_ERROR_HINTS = ("response_format", "json_schema", "json_object", "schema", "structured output")
+
+_lock = threading.Lock()
+_modes = {}
+
+
+class _ProbeEvent(BaseModel):
+    ok: bool
+
+
+def _provider_key(model_name: str) -> str:
+    return f"{os.getenv('BASE_URL_OPENAI') or 'default'}|{model_name}"
+
+
+def _capabilities_path() -> str:
+    return os.path.join(get_cache_dir(), "capabilities.json")
+
+
+def _load_capabilities() -> dict:
+    try:
+        with open(_capabilities_path(), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_mode(model_name: str, mode: str) -> None:
+    _modes[_provider_key(model_name)] = mode
+    capabilities = _load_capabilities()
+    capabilities[_provider_key(model_name)] = mode
+    with open(_capabilities_path(), "w") as f:
+        json.dump(capabilities, f, indent=2)
+
+
+def get_structured_output_mode(client, model_name: str) -> str:
+    """Return the structured-output mode for the configured provider and model.
+
+    The mode comes from STRUCTURED_OUTPUT_MODE when set; otherwise it is probed
+    once with a tiny request and cached in memory and on disk per BASE_URL/MODEL_NAME.
+    """
+    override = os.getenv("STRUCTURED_OUTPUT_MODE")
+    if override in MODES:
+        return override
+    key = _provider_key(model_name)
+    with _lock:
+        if key in _modes:
+            return _modes[key]
+        mode = _load_capabilities().get(key)
+        if mode not in MODES:
+            mode = _probe_mode(client, model_name)
+            _save_mode(model_name, mode)
+        _modes[key] = mode
+        return mode
+
+
+def is_mode_error(error: Exception) -> bool:
+    """True when a request was rejected for its response_format or schema rather than its content."""
+    if not isinstance(error, (BadRequestError, UnprocessableEntityError)):
+        return False
+    text = str(error).lower()
+    return any(hint in text for hint in MODE_ERROR_HINTS)
+
+
+def downgrade_mode(model_name: str, mode: str) -> Optional[str]:
+    """Record that a mode was rejected by the provider and return the next one to try."""
+    index = MODES.index(mode) + 1
+    if index >= len(MODES):
+        return None
+    with _lock:
+        _save_mode(model_name, MODES[index])
+    return MODES[index]
+
+
+def _probe_mode(client, model_name: str) -> str:
+    """Find the most capable mode the provider accepts using a minimal request.
+
+    Connection, auth, rate-limit and other API errors are raised so that an
+    unreachable provider is not recorded as supporting no structured output.
+    """
+    base_url = os.getenv("BASE_URL_OPENAI") or ""
+    if not base_url or any(host in base_url for host in NATIVE_PARSE_HOSTS):
+        return "parse"
+    probe = [{"role": "user", "content": "Reply with ok set to true."}]
+    for mode in MODES[:-1]:
+        try:
+            if mode == "parse":
+                completion = client.beta.chat.completions.parse(
+                    model=model_name, messages=probe, response_format=_ProbeEvent, max_tokens=50
+                )
+            else:
+                completion = client.chat.completions.create(
+                    model=model_name, max_tokens=50, **build_request(probe, _ProbeEvent, mode)
+                )
+            read_response(completion, _ProbeEvent)
+            return mode
+        except Exception as e:
+            if isinstance(e, APIError) and not is_mode_error(e):
+                raise
+            continue
+    return "prompt"
+
+
+def build_request(message: list, base_model: type, mode: str) -> dict:
+    """Build chat.completions.create keyword arguments for a non-parse mode."""
+    schema = base_model.model_json_schema()
+    if mode == "json_schema":
+        return {
+            "messages": message,
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {"name": base_model.__name__, "schema": schema},
+            },
+        }
+    instruction = {
+        "role": "system",
+        "content": (
+            "Respond only with a single JSON object that matches this JSON schema, "
+            f"without markdown fences or commentary:\n{json.dumps(schema)}"
+        ),
+    }
+    request = {"messages": list(message) + [instruction]}
+    if mode == "json_object":
+        request["response_format"] = {"type": "json_object"}
+    return request
+
+
+def read_response(completion, base_model: type) -> BaseModel:
+    """Return the parsed model from a completion, repairing raw JSON content locally if needed."""
+    message = completion.choices[0].message
+    parsed = getattr(message, "parsed", None)
+    if isinstance(parsed, base_model):
+        return parsed
+    return parse_model_output(message.content or "", base_model)
+
+
+def parse_model_output(text: str, base_model: type) -> BaseModel:
+    """Validate model output against base_model, repairing malformed JSON without another LLM call."""
+    try:
+        return base_model.model_validate_json(text)
+    except ValidationError:
+        pass
+    repaired = repair_json(text)
+    try:
+        return base_model.model_validate_json(repaired)
+    except ValidationError:
+        # Some models wrap the object, e.g. {"CodeGenerationEvent": {...}}
+        data = json.loads(repaired)
+        if isinstance(data, dict) and len(data) == 1:
+            inner = next(iter(data.values()))
+            if isinstance(inner, dict):
+                return base_model.model_validate(inner)
+        raise
+
+
+def repair_json(text: str) -> str:
+    """Best-effort fix-up of almost-JSON: code fences, surrounding prose, trailing commas, truncation."""
+    text = text.strip()
+    if text.startswith("```"):
+        # Only an outer fence is stripped; fences inside string values (generated README files) stay
+        text = re.sub(r"^```[\w-]*\s*", "", text)
+        # A closing fence ends the stripped text; a truncated response has none
+        if text.endswith("```"):
+            text = text[:-3]
+        text = text.strip()
+    start = text.find("{")
+    if start > 0:
+        text = text[start:]
+
+    out = []
+    stack = []
+    in_string = False
+    escape = False
+    for char in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            elif char == "\n":
+                # Raw newlines are invalid inside JSON strings
+                out.append("\\n")
+                continue
+            out.append(char)
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            # Drop a trailing comma before the closing bracket
+            while out and out[-1] in " \t\r\n":
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack:
+                stack.pop()
+            out.append(char)
+            if not stack:
+                break
+            continue
+        out.append(char)
+
+    # Close whatever a truncated response left open
+    if in_string:
+        if escape:
+            out.pop()
+        out.append('"')
+    while out and out[-1] in " \t\r\n,:":
+        out.pop()
+    out.extend(reversed(stack))
+    return "".join(out)
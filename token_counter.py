@@ -0,0 +1,42 @@
+import os
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a character-based estimate
+    tiktoken = None
+
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=8)
+def _encoding(model_name: str):
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Encodings are downloaded on first use; offline machines use the estimate
+        return None
+
+
+def count_tokens(text: str, model_name: str | None = None) -> int:
+    """Count tokens locally with tiktoken when available, otherwise estimate ~4 characters per token."""
+    if not text:
+        return 0
+    encoding = _encoding(model_name or os.getenv("MODEL_NAME") or "gpt-4o")
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def count_message_tokens(messages: list, model_name: str | None = None) -> int:
+    """Approximate prompt size of a chat message list."""
+    return sum(
+        count_tokens(str(message.get("content") or ""), model_name) + MESSAGE_OVERHEAD_TOKENS
+        for message in messages
+    )
@@ -0,0 +1,44 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+_usage: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("llm_usage", default=None)
+_lock = threading.Lock()
+
+
+def _empty_usage() -> dict:
+    return {"requests": 0, "cached_responses": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+
+@contextmanager
+def track_usage():
+    """Collect LLM token usage for everything run inside the block and yield the running totals."""
+    usage = _empty_usage()
+    token = _usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _usage.reset(token)
+
+
+def record_usage(completion_usage) -> None:
+    """Add a completion's usage (the `usage` field of an OpenAI response, may be None) to the current totals."""
+    usage = _usage.get()
+    if usage is None:
+        return
+    with _lock:
+        usage["requests"] += 1
+        if completion_usage is not None:
+            usage["prompt_tokens"] += getattr(completion_usage, "prompt_tokens", 0) or 0
+            usage["completion_tokens"] += getattr(completion_usage, "completion_tokens", 0) or 0
+            usage["total_tokens"] += getattr(completion_usage, "total_tokens", 0) or 0
+
+
+def record_cache_hit() -> None:
+    """Count a request answered from the response cache."""
+    usage = _usage.get()
+    if usage is None:
+        return
+    with _lock:
+        usage["cached_responses"] += 1
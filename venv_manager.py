@@ -0,0 +1,224 @@
+import glob
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import venv
+
+from dotenv import load_dotenv
+
+from project_snapshot import write_file
+from response_cache import get_cache_dir
+
+# Load environment variables
+load_dotenv()
+
+READY_MARKER = "vibe_requirements.txt"
+PROJECT_VENV_FILE = ".vibe_venv"
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def venv_pool_enabled() -> bool:
+    """Return True unless the shared virtualenv pool is disabled via USE_VENV_POOL."""
+    return os.getenv("USE_VENV_POOL", "true").lower() not in ("0", "false", "no")
+
+
+def _pool_dir() -> str:
+    pool_dir = os.getenv("VENV_POOL_DIR", os.path.join(get_cache_dir(), "venvs"))
+    os.makedirs(pool_dir, exist_ok=True)
+    return pool_dir
+
+
+def _requirement_lines(requirements_path: str) -> dict:
+    """Map each requirement line's normalized form (for fingerprints) to the line as written (for pip)."""
+    if not os.path.exists(requirements_path):
+        return {}
+    lines = {}
+    with open(requirements_path, "r") as f:
+        for line in f:
+            line = line.split(" #", 1)[0].strip()
+            if not line or line.startswith("#"):
+                continue
+            lines.setdefault(" ".join(line.lower().split()), line)
+    return lines
+
+
+def normalize_requirements(requirements_path: str) -> list[str]:
+    """Return the sorted, de-duplicated requirement lines without comments or blank lines."""
+    return sorted(_requirement_lines(requirements_path))
+
+
+def _is_option(line: str) -> bool:
+    """Lines such as --index-url or -r that configure pip rather than name a package."""
+    return line.startswith("-") and not line.startswith(("-e", "--editable"))
+
+
+def requirements_hash(requirements: list[str]) -> str:
+    """Fingerprint a normalized requirements list."""
+    return hashlib.sha256("\n".join(requirements).encode("utf-8")).hexdigest()[:16]
+
+
+def _bin_dir(venv_dir: str) -> str:
+    return os.path.join(venv_dir, "Scripts" if os.name == "nt" else "bin")
+
+
+def venv_python(venv_dir: str) -> str:
+    """Path of the interpreter inside a virtualenv."""
+    return os.path.join(_bin_dir(venv_dir), "python.exe" if os.name == "nt" else "python")
+
+
+def venv_env(venv_dir: str) -> dict:
+    """Environment variables that make commands resolve to the virtualenv's executables."""
+    env = dict(os.environ)
+    env.pop("PYTHONHOME", None)
+    env["VIRTUAL_ENV"] = venv_dir
+    env["PATH"] = _bin_dir(venv_dir) + os.pathsep + env.get("PATH", "")
+    return env
+
+
+def site_packages_dir(venv_dir: str) -> str | None:
+    """Path of a virtualenv's site-packages directory, if it exists."""
+    if os.name == "nt":
+        path = os.path.join(venv_dir, "Lib", "site-packages")
+        return path if os.path.isdir(path) else None
+    matches = glob.glob(os.path.join(venv_dir, "lib", "python*", "site-packages"))
+    return matches[0] if matches else None
+
+
+def _ready_requirements(venv_dir: str) -> list[str] | None:
+    """Requirements a pooled environment was built for, or None if it is not ready."""
+    marker = os.path.join(venv_dir, READY_MARKER)
+    if not os.path.exists(marker) or not os.path.exists(venv_python(venv_dir)):
+        return None
+    with open(marker, "r") as f:
+        return [line for line in f.read().splitlines() if line]
+
+
+def _closest_venv(requirements: list[str]) -> tuple[str | None, list[str]]:
+    """Find the ready environment sharing the most requirement lines with the given set."""
+    wanted = set(requirements)
+    best_dir, best_requirements, best_overlap = None, [], 0
+    for venv_dir in glob.glob(os.path.join(_pool_dir(), "*")):
+        existing = _ready_requirements(venv_dir)
+        if existing is None:
+            continue
+        overlap = len(wanted & set(existing))
+        if overlap > best_overlap:
+            best_dir, best_requirements, best_overlap = venv_dir, existing, overlap
+    return best_dir, best_requirements
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _clone_packages(source_dir: str, target_dir: str) -> None:
+    """Seed a fresh virtualenv with another one's installed packages and console scripts."""
+    source_site, target_site = site_packages_dir(source_dir), site_packages_dir(target_dir)
+    if not source_site or not target_site:
+        return
+    shutil.copytree(source_site, target_site, copy_function=_link_or_copy, dirs_exist_ok=True, symlinks=True)
+
+    # Console scripts (streamlit, uvicorn, ...) hard-code their interpreter in the shebang
+    source_python = venv_python(source_dir).encode()
+    target_python = venv_python(target_dir).encode()
+    source_bin, target_bin = _bin_dir(source_dir), _bin_dir(target_dir)
+    for name in os.listdir(source_bin):
+        src, dst = os.path.join(source_bin, name), os.path.join(target_bin, name)
+        if os.path.exists(dst) or os.path.islink(src) or not os.path.isfile(src):
+            continue
+        with open(src, "rb") as f:
+            content = f.read()
+        if not content.startswith(b"#!"):
+            continue
+        with open(dst, "wb") as f:
+            f.write(content.replace(source_python, target_python, 1))
+        shutil.copymode(src, dst)
+
+
+def _pip_install(venv_dir: str, requirements_path: str) -> None:
+    # Run from the file's directory so relative paths in it resolve as they do for the project
+    subprocess.run(
+        [venv_python(venv_dir), "-m", "pip", "install", "--disable-pip-version-check", "-r", os.path.abspath(requirements_path)],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(requirements_path)),
+    )
+
+
+def _pip_install_lines(venv_dir: str, requirements_path: str, lines: list[str]) -> None:
+    """Install some lines of requirements_path through a temporary requirements file next to it."""
+    fd, delta_path = tempfile.mkstemp(suffix=".txt", prefix=".vibe_delta_", dir=os.path.dirname(os.path.abspath(requirements_path)))
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        _pip_install(venv_dir, delta_path)
+    finally:
+        os.remove(delta_path)
+
+
+def get_venv(requirements_path: str) -> str:
+    """Return a pooled virtualenv satisfying requirements_path, building it if needed.
+
+    An environment with the same requirements fingerprint is reused as-is.
+    Otherwise the closest cached environment is cloned and only the missing
+    requirement lines are installed. Raises subprocess.CalledProcessError when
+    pip fails.
+    """
+    lines = _requirement_lines(requirements_path)
+    requirements = sorted(lines)
+    venv_dir = os.path.join(_pool_dir(), requirements_hash(requirements))
+    with _locks_guard:
+        lock = _locks.setdefault(venv_dir, threading.Lock())
+    with lock:
+        if _ready_requirements(venv_dir) is not None:
+            return venv_dir
+
+        shutil.rmtree(venv_dir, ignore_errors=True)
+        venv.EnvBuilder(with_pip=True, symlinks=os.name != "nt").create(venv_dir)
+        source_dir, source_requirements = _closest_venv(requirements)
+        if source_dir:
+            print(f"Cloning environment {os.path.basename(source_dir)} and installing the difference...")
+            _clone_packages(source_dir, venv_dir)
+            # Pip options (index URLs, nested -r files) apply to whatever is installed, so keep them
+            installed = set(source_requirements)
+            missing = [normalized for normalized in requirements if normalized not in installed]
+            if missing:
+                options = [line for normalized, line in lines.items() if _is_option(line) and normalized not in missing]
+                _pip_install_lines(venv_dir, requirements_path, options + [lines[normalized] for normalized in missing])
+        elif requirements:
+            _pip_install(venv_dir, requirements_path)
+
+        with open(os.path.join(venv_dir, READY_MARKER), "w") as f:
+            f.write("\n".join(requirements) + "\n")
+        return venv_dir
+
+
+def assign_venv(project_dir: str, venv_dir: str) -> None:
+    """Record which pooled environment a project runs in."""
+    write_file(os.path.join(project_dir, PROJECT_VENV_FILE), venv_dir)
+
+
+def project_venv(project_dir: str) -> str | None:
+    """The pooled virtualenv a project was assigned to, if it still exists."""
+    path = os.path.join(project_dir, PROJECT_VENV_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        venv_dir = f.read().strip()
+    return venv_dir if os.path.exists(venv_python(venv_dir)) else None
+
+
+def project_env(project_dir: str) -> dict | None:
+    """Environment for running a project with its pooled virtualenv, or None to use the current one."""
+    venv_dir = project_venv(project_dir)
+    return venv_env(venv_dir) if venv_dir else None